@@ -0,0 +1,52 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+from datetime import datetime
+import random
+import time
+
+from currency_converter import RateSnapshot, get_fallback_rates, minor_unit_exponent
+
+# Compares the scaled-integer conversion path against decimal.Decimal for
+# the same batch of minor-unit amounts, and checks they agree exactly.
+#   python bench_fixed_point.py
+
+ROWS = 100_000
+ROUNDS = 5
+
+def decimal_convert_many(rates, amounts, from_codes, to_codes):
+    """Reference path: exact decimals, quantized to the target's minor unit"""
+    decimal_rates = {code: Decimal(repr(rate)) for code, rate in rates.items()}
+    exponents = {code: minor_unit_exponent(code) for code in rates}
+    quanta = {code: Decimal(1).scaleb(-exponent) for code, exponent in exponents.items()}
+    results = []
+    for amount, f, t in zip(amounts, from_codes, to_codes):
+        value = Decimal(amount).scaleb(-exponents[f]) * decimal_rates[t] / decimal_rates[f]
+        value = value.quantize(quanta[t], rounding=ROUND_HALF_EVEN)
+        results.append(int(value.scaleb(exponents[t])))
+    return results
+
+def best_of(fn, *args):
+    best = float('inf')
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+if __name__ == '__main__':
+    # Rebased through EUR, so rates carry full float precision like triangulated ones do
+    rates = {code: rate / get_fallback_rates()['EUR'] for code, rate in get_fallback_rates().items()}
+    snapshot = RateSnapshot.build(rates, 0, datetime.now())
+    codes = list(rates)
+    rng = random.Random(4217)
+    amounts = [rng.randrange(-10**9, 10**9) for _ in range(ROWS)]
+    from_codes = [rng.choice(codes) for _ in range(ROWS)]
+    to_codes = [rng.choice(codes) for _ in range(ROWS)]
+
+    fixed_time, fixed = best_of(snapshot.fixed.convert_many, amounts, from_codes, to_codes)
+    decimal_time, reference = best_of(decimal_convert_many, rates, amounts, from_codes, to_codes)
+
+    mismatches = sum(a != b for a, b in zip(fixed, reference))
+    print(f"{ROWS} conversions, best of {ROUNDS}")
+    print(f"  fixed point  {fixed_time * 1000:8.1f} ms  {ROWS / fixed_time:12,.0f}/s")
+    print(f"  decimal      {decimal_time * 1000:8.1f} ms  {ROWS / decimal_time:12,.0f}/s")
+    print(f"  speedup      {decimal_time / fixed_time:8.1f}x, mismatches: {mismatches}")
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+import csv
+import gzip
+import io
+import json
+import random
+import time
+import tracemalloc
+
+from currency_converter import (
+    ColumnarHistory, encode_csv_chunks, encode_history_ndjson, encode_history_rows,
+    get_fallback_rates, group_chunks,
+)
+
+# Compares the history export formats on the same synthetic rows: bytes on
+# the wire (plain and gzipped) and how long a client takes to decode them,
+# against the JSON array /api/history returns. Also streams a larger export
+# through the columnar encoder to check its memory stays flat.
+#   python bench_history_export.py
+
+ROWS = 200_000
+STREAM_ROWS = 2_000_000
+ROUNDS = 3
+
+def synthetic_rows(count, seed=4217):
+    """History rows shaped like query_history output, newest first"""
+    rng = random.Random(seed)
+    rates = get_fallback_rates()
+    codes = list(rates)
+    started = datetime(2026, 10, 1)
+    for i in range(count, 0, -1):
+        f, t = rng.choice(codes), rng.choice(codes)
+        amount = round(rng.uniform(1, 10_000), 2)
+        rate = rates[t] / rates[f]
+        timestamp = (started + timedelta(seconds=i * 7)).strftime('%Y-%m-%d %H:%M:%S')
+        yield (202610 * 10**10 + i, timestamp, f, t, amount, round(amount * rate, 2), rate)
+
+def encode(fmt, rows):
+    if fmt == 'json':
+        return b''.join(encode_history_rows(rows))
+    if fmt == 'ndjson':
+        return b''.join(group_chunks(encode_history_ndjson(rows)))
+    if fmt == 'csv':
+        return b''.join(encode_csv_chunks(rows))
+    return b''.join(group_chunks(ColumnarHistory.encode(rows)))
+
+def decode(fmt, data):
+    if fmt == 'json':
+        return len(json.loads(data))
+    if fmt == 'ndjson':
+        return sum(1 for line in data.splitlines() if json.loads(line))
+    if fmt == 'csv':
+        return sum(1 for row in csv.reader(io.StringIO(data.decode())))
+    return len(ColumnarHistory.decode(data)['id'])
+
+def best_of(fn, *args):
+    best = float('inf')
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+if __name__ == '__main__':
+    rows = list(synthetic_rows(ROWS))
+    print(f"{ROWS} rows, best of {ROUNDS}")
+    print(f"  {'format':8} {'bytes':>12} {'gzipped':>12} {'decode ms':>10}")
+    for fmt in ('json', 'ndjson', 'csv', 'columnar'):
+        data = encode(fmt, rows)
+        decode_time, decoded = best_of(decode, fmt, data)
+        assert decoded == ROWS, (fmt, decoded)
+        print(f"  {fmt:8} {len(data):12,} {len(gzip.compress(data, 6)):12,} {decode_time * 1000:10.1f}")
+
+    tracemalloc.start()
+    exported = sum(len(chunk) for chunk in group_chunks(ColumnarHistory.encode(synthetic_rows(STREAM_ROWS))))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  streamed {STREAM_ROWS:,} columnar rows ({exported:,} bytes), peak memory {peak / 2**20:.1f} MiB")
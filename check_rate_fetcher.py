@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+# Runs RateProvider and RateFetcher against local stub providers on
+# ephemeral ports, steering their faults through /control, and asserts
+# that conditional requests come back 304, an unchanged body is not parsed
+# again, a slow provider gets hedged and a failing one is taken out of
+# rotation until it recovers.
+#   python check_rate_fetcher.py
+
+# Any configured URL turns off the demo rates; the providers below are built by hand
+os.environ.setdefault('EXCHANGE_RATE_API_URL', 'http://127.0.0.1:9/v4/latest/{base}')
+
+from currency_converter import BREAKER_THRESHOLD, HEDGE_DELAY, CircuitBreaker, RateFetcher, RateProvider
+from stub_rate_provider import StubProviderHandler, StubProviderServer, StubRates
+
+SLOW_LATENCY = HEDGE_DELAY + 1.0  # Slow enough that the hedge always wins
+BREAKER_BACKOFF = 0.2  # Short out-of-rotation period so the check does not wait long
+
+class QuietHandler(StubProviderHandler):
+    def log_message(self, format, *args):
+        pass
+
+def start_stub():
+    server = StubProviderServer(('127.0.0.1', 0), QuietHandler, rates=StubRates(interval=3600))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def control(server, **faults):
+    """Change a stub's faults and return its counters"""
+    query = urllib.parse.urlencode(faults)
+    with urllib.request.urlopen(f'http://127.0.0.1:{server.server_port}/control?{query}') as response:
+        return json.load(response)
+
+def provider_for(server, name):
+    provider = RateProvider(name, f'http://127.0.0.1:{server.server_port}/v4/latest/{{base}}')
+    provider.breaker = CircuitBreaker(backoff=BREAKER_BACKOFF, max_backoff=BREAKER_BACKOFF)
+    return provider
+
+async def check_not_modified(server):
+    control(server, latency=0, failure_rate=0, conditional=1)
+    provider = provider_for(server, 'conditional')
+    first = await provider.fetch('USD')
+    assert first.rates and first.rates['USD'] == 1.0, first
+    second = await provider.fetch('USD')
+    assert second.rates is None, second
+    assert provider.not_modified == 1 and provider.downloads == 1, provider.stats()
+    assert control(server)['not_modified'] == 1
+    print("✓ a repeated fetch is answered 304 and keeps the current rates")
+
+async def check_unchanged_body(server):
+    control(server, latency=0, failure_rate=0, conditional=0)
+    provider = provider_for(server, 'unconditional')
+    await provider.fetch('USD')
+    again = await provider.fetch('USD')
+    assert again.rates is None, again
+    assert provider.downloads == 2 and provider.unchanged == 1 and provider.not_modified == 0, provider.stats()
+    print("✓ a 200 with the same body is recognised by its hash and not parsed again")
+
+async def check_hedging(slow, fast):
+    control(slow, latency=SLOW_LATENCY, failure_rate=0, conditional=1)
+    control(fast, latency=0, failure_rate=0, conditional=1)
+    fetcher = RateFetcher([provider_for(slow, 'slow'), provider_for(fast, 'fast')])
+    started = time.monotonic()
+    result = await fetcher.fetch('USD')
+    elapsed = time.monotonic() - started
+    assert result.rates, result
+    assert fetcher.hedges == 1 and fetcher.hedge_wins == 1, fetcher.stats()
+    assert elapsed < SLOW_LATENCY, elapsed
+    slow_provider = fetcher.providers[0]
+    assert slow_provider.errors == 0 and slow_provider.breaker.failures == 0, slow_provider.stats()
+    print(f"✓ a slow provider is hedged after {HEDGE_DELAY}s and the loser is not blamed "
+          f"({elapsed:.2f}s)")
+
+async def check_breaker(server):
+    control(server, latency=0, failure_rate=1, conditional=1)
+    provider = provider_for(server, 'flaky')
+    fetcher = RateFetcher([provider])
+    for _ in range(BREAKER_THRESHOLD):
+        try:
+            await fetcher.fetch('USD')
+        except RuntimeError as e:
+            assert 'HTTP 503' in str(e), e
+        else:
+            raise AssertionError("fetch from a failing provider succeeded")
+    assert provider.breaker.state == 'open', provider.stats()
+
+    requests = control(server)['requests']
+    try:
+        await fetcher.fetch('USD')
+    except RuntimeError as e:
+        assert 'out of rotation' in str(e), e
+    else:
+        raise AssertionError("fetch went through an open breaker")
+    assert control(server)['requests'] == requests, "an open breaker still reached the provider"
+
+    control(server, failure_rate=0)
+    await asyncio.sleep(BREAKER_BACKOFF * 1.5)
+    assert provider.breaker.state == 'half-open', provider.stats()
+    result = await fetcher.fetch('USD')
+    assert result.rates, result
+    assert provider.breaker.state == 'closed', provider.stats()
+    print(f"✓ {BREAKER_THRESHOLD} failures open the breaker, which skips the provider until "
+          f"a trial request after the backoff succeeds")
+
+async def main(primary, secondary):
+    await check_not_modified(primary)
+    await check_unchanged_body(primary)
+    await check_hedging(primary, secondary)
+    await check_breaker(secondary)
+
+if __name__ == '__main__':
+    primary, secondary = start_stub(), start_stub()
+    try:
+        asyncio.run(main(primary, secondary))
+    finally:
+        primary.shutdown()
+        secondary.shutdown()
+    print("All rate fetcher checks passed")
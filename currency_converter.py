@@ -1,13 +1,37 @@
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import json
 import urllib.parse
-import urllib.request
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
 import sqlite3
 from dataclasses import dataclass
+from contextlib import contextmanager
+from collections import OrderedDict, deque
 from typing import Dict, List, Optional
 import threading
+import asyncio
+import ssl
+import random
+import time
+import sys
+import io
+import csv
+import itertools
+import queue
+import struct
+import bisect
+import math
+import gzip
+import zlib
+import selectors
+import socket
+import hashlib
+import mmap
+import tempfile
+import multiprocessing
+from multiprocessing import shared_memory
+from array import array
+from fractions import Fraction
 
 @dataclass
 class CurrencyRate:
@@ -16,34 +40,2379 @@ class CurrencyRate:
     rate: float
     last_updated: datetime
 
-class CurrencyConverterHandler(BaseHTTPRequestHandler):
+CACHE_DURATION = 3600  # Rates are considered fresh for 1 hour
+REFRESH_AHEAD = 0.8  # Refresh in the background at 80% of CACHE_DURATION
+RETRY_INTERVAL = 60  # Seconds to wait before retrying a failed refresh
+PROVIDER_UPDATE_MARGIN = 5  # Seconds after the provider's next update before asking for it
+REFRESH_JITTER = 0.1  # Fraction of each refresh delay randomized to spread out upstream calls
+
+DATABASE_PATH = 'currency_converter.db'
+DB_POOL_SIZE = 8  # Most SQLite connections open at once
+DB_CACHE_KIB = 16 * 1024  # Page cache per connection
+DB_MMAP_SIZE = 256 * 1024 * 1024  # Bytes of the database file to memory-map
+DB_STATEMENT_CACHE = 128  # Prepared statements kept per connection
+HISTORY_QUEUE_SIZE = 10000  # Pending history records before /api/save pushes back
+HISTORY_BATCH_SIZE = 500  # Most records written in one group commit
+HISTORY_FLUSH_INTERVAL = 0.25  # Seconds a batch may wait to fill before it is written
+HISTORY_RETENTION_MONTHS = int(os.environ.get('HISTORY_RETENTION_MONTHS', 12))  # 0 keeps history forever
+DB_MAINTENANCE_INTERVAL = 60  # Seconds between background checkpoints
+DB_MAINTENANCE_HOURS = os.environ.get('DB_MAINTENANCE_HOURS', '2-5')  # Off-peak UTC hours for retention and vacuum
+DB_VACUUM_STEP_PAGES = 256  # Free pages returned per incremental vacuum step
+DB_WAL_AUTOCHECKPOINT = 16384  # WAL pages before a commit checkpoints itself, should maintenance stall
+
+CURRENCY_SOURCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'currencies.csv')
+CURRENCY_REGISTRY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'currencies.bin')
+
+class CurrencyRegistry:
+    """ISO 4217 currencies, memory-mapped from a file compiled from currencies.csv.
+    
+    Row order fixes each code's ordinal, so new currencies go at the end.
+    """
+    
+    MAGIC = b'FXCY'
+    FORMAT = 1
+    HEADER = struct.Struct('<4sHHI')  # magic, format, count, string table offset
+    RECORD = struct.Struct('<3sHBBIBBd')  # code, numeric, minor units, flags, name offset,
+                                          # name length, symbol length, fallback rate
+    POPULAR = 0x01
+    
+    def __init__(self, path=CURRENCY_REGISTRY_FILE, source=CURRENCY_SOURCE_FILE):
+        self.path = path
+        self.source = source
+        self.lock = threading.Lock()
+        self._data = None
+    
+    @classmethod
+    def encode(cls, source):
+        """Encode the rows of a currencies CSV file in the registry format"""
+        records = []
+        strings = bytearray()
+        with open(source, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                name, symbol = row['name'].encode('utf-8'), row['symbol'].encode('utf-8')
+                records.append(cls.RECORD.pack(
+                    row['code'].encode('ascii'), int(row['numeric']), int(row['minor_units']),
+                    cls.POPULAR if row['popular'] == 'y' else 0,
+                    len(strings), len(name), len(symbol),
+                    float(row['fallback_rate']) if row['fallback_rate'] else math.nan,
+                ))
+                strings += name + symbol
+        header = cls.HEADER.pack(cls.MAGIC, cls.FORMAT, len(records),
+                                 cls.HEADER.size + cls.RECORD.size * len(records))
+        return header + b''.join(records) + bytes(strings)
+    
+    @classmethod
+    def compile(cls, source, path):
+        """Write the registry file for a currencies CSV file"""
+        data = cls.encode(source)
+        # A private temporary file, so processes starting together do not interleave writes
+        fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                          dir=os.path.dirname(path) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    
+    def _stale(self):
+        try:
+            return os.path.getmtime(self.path) < os.path.getmtime(self.source)
+        except FileNotFoundError:
+            return os.path.exists(self.source)
+    
+    def _load(self):
+        with self.lock:
+            if self._data is not None:
+                return
+            data = None
+            if self._stale():
+                try:
+                    self.compile(self.source, self.path)
+                except OSError as e:
+                    print(f"⚠️  Cannot write {self.path} ({e}); reading {self.source} instead")
+                    data = self.encode(self.source)
+            if data is None:
+                with open(self.path, 'rb') as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, fmt, count, strings = self.HEADER.unpack_from(data)
+            if magic != self.MAGIC or fmt != self.FORMAT:
+                raise ValueError(f"Not a currency registry: {self.path}")
+            offsets = range(self.HEADER.size, strings, self.RECORD.size)
+            self._codes = [sys.intern(data[offset:offset + 3].decode('ascii')) for offset in offsets]
+            self._ordinals = {code: i for i, code in enumerate(self._codes)}
+            self._records = count
+            self._strings = strings
+            self._entries = [None] * count
+            self._data = data
+    
+    def _record(self, ordinal):
+        return self.RECORD.unpack_from(self._data, self.HEADER.size + ordinal * self.RECORD.size)
+    
+    @property
+    def codes(self):
+        if self._data is None:
+            self._load()
+        return self._codes
+    
+    def __len__(self):
+        return len(self.codes)
+    
+    def get(self, code):
+        """Return the ordinal for ``code``, or None if it is not known"""
+        if self._data is None:
+            self._load()
+        return self._ordinals.get(code)
+    
+    def ordinal(self, code):
+        ordinal = self.get(code)
+        if ordinal is None:
+            raise ValueError(f"Unsupported currency: {code}")
+        return ordinal
+    
+    def intern(self, code):
+        """Return the ordinal for ``code``, giving unknown codes the next free one"""
+        ordinal = self.get(code)
+        if ordinal is not None:
+            return ordinal
+        with self.lock:
+            ordinal = self._ordinals.get(code)
+            if ordinal is None:
+                ordinal = len(self._codes)
+                self._codes.append(sys.intern(code))
+                self._ordinals[code] = ordinal
+            return ordinal
+    
+    def exponent(self, ordinal):
+        """Return the number of minor unit digits, 2 for codes outside the file"""
+        if ordinal >= self._records:
+            return 2
+        return self._record(ordinal)[2]
+    
+    def info(self, ordinal):
+        """Return code, name, symbol, numeric code and minor units of a currency"""
+        if self._data is None:
+            self._load()
+        if ordinal >= self._records:
+            code = self._codes[ordinal]
+            return {'code': code, 'name': code, 'symbol': code, 'numeric': None, 'minor_units': 2}
+        entry = self._entries[ordinal]
+        if entry is None:
+            code, numeric, minor_units, _, name_offset, name_length, symbol_length, _ = self._record(ordinal)
+            start = self._strings + name_offset
+            entry = self._entries[ordinal] = {
+                'code': self._codes[ordinal],
+                'name': self._data[start:start + name_length].decode('utf-8'),
+                'symbol': self._data[start + name_length:start + name_length + symbol_length].decode('utf-8'),
+                'numeric': numeric,
+                'minor_units': minor_units,
+            }
+        return entry
+    
+    def popular(self):
+        """Return the codes flagged as popular, in file order"""
+        return [code for ordinal, code in enumerate(self.codes[:self._records])
+                if self._record(ordinal)[3] & self.POPULAR]
+    
+    def fallback_rates(self):
+        """Return the USD rates shipped with the file for running without upstream"""
+        rates = {}
+        for ordinal, code in enumerate(self.codes[:self._records]):
+            rate = self._record(ordinal)[7]
+            if not math.isnan(rate):
+                rates[code] = rate
+        return rates
+
+CURRENCIES = CurrencyRegistry()
+
+def get_fallback_rates():
+    """Fallback exchange rates for demo purposes"""
+    return CURRENCIES.fallback_rates()
+
+EXCHANGE_RATE_API_URL = os.environ.get(
+    'EXCHANGE_RATE_API_URL', 'https://api.exchangerate-api.com/v4/latest/{base}')
+# Get free key from exchangerate-api.com
+EXCHANGE_RATE_API_KEY = os.environ.get('EXCHANGE_RATE_API_KEY', 'YOUR_API_KEY_HERE')
+# Extra sources as "name=url,name=url"; each URL has a {base} placeholder
+EXCHANGE_RATE_PROVIDERS = os.environ.get(
+    'EXCHANGE_RATE_PROVIDERS', 'open-er-api=https://open.er-api.com/v6/latest/{base}')
+# More bases fetched alongside USD, e.g. "EUR,INR"; their rates fill in currencies USD lacks
+EXCHANGE_RATE_EXTRA_BASES = [
+    base.strip().upper() for base in os.environ.get('EXCHANGE_RATE_EXTRA_BASES', '').split(',')
+    if base.strip()
+]
+
+PROVIDER_TIMEOUT = 5.0  # Seconds one provider may take to answer
+FETCH_DEADLINE = 10.0  # Seconds a whole fetch may take across all providers
+HEDGE_DELAY = 1.0  # Seconds before hedging while a provider has too few samples for a p95
+BREAKER_THRESHOLD = 3  # Consecutive failures before a provider is taken out of rotation
+BREAKER_BACKOFF = 5.0  # First out-of-rotation period, doubled on each further failure
+BREAKER_MAX_BACKOFF = 300.0
+
+_SSL_CONTEXT = None
+
+async def http_get(url, headers=None):
+    """Minimal asyncio HTTP/1.1 GET returning (status, lower-cased headers, body)"""
+    global _SSL_CONTEXT
+    parts = urllib.parse.urlsplit(url)
+    https = parts.scheme == 'https'
+    if https and _SSL_CONTEXT is None:
+        _SSL_CONTEXT = ssl.create_default_context()
+    path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, parts.port or (443 if https else 80),
+        ssl=_SSL_CONTEXT if https else None)
+    try:
+        request_headers = {
+            'Host': parts.netloc,
+            'User-Agent': 'currency-converter',
+            'Accept': 'application/json',
+            'Connection': 'close',
+            **(headers or {}),
+        }
+        request = f'GET {path} HTTP/1.1\r\n' + ''.join(
+            f'{name}: {value}\r\n' for name, value in request_headers.items()) + '\r\n'
+        writer.write(request.encode('latin-1'))
+        await writer.drain()
+        
+        status_line = (await reader.readline()).split()
+        if len(status_line) < 2 or not status_line[1].isdigit():
+            raise ConnectionError(f"Malformed HTTP response from {parts.netloc}")
+        status = int(status_line[1])
+        response_headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        
+        if status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif 'chunked' in response_headers.get('transfer-encoding', '').lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';', 1)[0].strip(), 16)
+                if size == 0:
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            body = await reader.readexactly(int(response_headers['content-length']))
+        else:
+            body = await reader.read()
+        return status, response_headers, body
+    finally:
+        writer.close()
+
+@dataclass(frozen=True)
+class FetchResult:
+    """Outcome of one upstream fetch"""
+    rates: Optional[Dict[str, float]]  # None when the provider's rates have not changed
+    next_update: Optional[datetime] = None  # When the provider says it will publish again
+
+class CircuitBreaker:
+    """Take a failing provider out of rotation with exponential backoff"""
+    
+    def __init__(self, threshold=BREAKER_THRESHOLD, backoff=BREAKER_BACKOFF,
+                 max_backoff=BREAKER_MAX_BACKOFF):
+        self.threshold = threshold
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self.backoff = backoff
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+    
+    def allow(self):
+        """True when closed, or half-open after the backoff has run out"""
+        return time.monotonic() >= self.open_until
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.backoff = self.base_backoff
+            self.open_until = 0.0
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.open_until = time.monotonic() + self.backoff
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+    
+    @property
+    def state(self):
+        if self.failures < self.threshold:
+            return 'closed'
+        return 'open' if not self.allow() else 'half-open'
+
+class RateProvider:
+    """One upstream rate source, fetched conditionally and not re-parsed when unchanged"""
+    
+    def __init__(self, name, url_template, timeout=PROVIDER_TIMEOUT):
+        self.name = name
+        self.url_template = url_template
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+        self.latencies = deque(maxlen=100)
+        self._validators = {}  # base -> (etag, last_modified, body digest, next update)
+        self.downloads = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.errors = 0
+    
+    def hedge_delay(self):
+        """How long to wait before hedging: this provider's p95 latency"""
+        samples = sorted(self.latencies)
+        if len(samples) < 20:
+            return min(HEDGE_DELAY, self.timeout)
+        return samples[int(len(samples) * 0.95) - 1]
+    
+    async def fetch(self, base):
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.timeout):
+                result = await self._fetch(base)
+        except asyncio.CancelledError:
+            # A hedge that lost the race is not the provider's fault
+            raise
+        except Exception:
+            self.errors += 1
+            self.breaker.record_failure()
+            raise
+        self.latencies.append(time.monotonic() - started)
+        self.breaker.record_success()
+        return result
+    
+    async def _fetch(self, base):
+        etag, last_modified, digest, next_update = self._validators.get(base, (None,) * 4)
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        
+        status, response_headers, body = await http_get(self.url_template.format(base=base), headers)
+        if status == 304:
+            self.not_modified += 1
+            return FetchResult(None, next_update)
+        if status != 200:
+            raise RuntimeError(f"HTTP {status} from {self.name}")
+        etag = response_headers.get('etag')
+        last_modified = response_headers.get('last-modified')
+        self.downloads += 1
+        
+        previous_digest = digest
+        digest = hashlib.sha256(body).digest()
+        if digest == previous_digest:
+            self._validators[base] = (etag, last_modified, digest, next_update)
+            self.unchanged += 1
+            return FetchResult(None, next_update)
+        
+        data = json.loads(body.decode())
+        rates = data['rates']
+        # Add NPR if not in API response (API might not have NPR)
+        if 'NPR' not in rates:
+            rates['NPR'] = 133.25  # Default fallback rate
+        
+        next_update = data.get('time_next_update_unix', data.get('time_next_update'))
+        next_update = datetime.fromtimestamp(next_update) if isinstance(next_update, (int, float)) else None
+        self._validators[base] = (etag, last_modified, digest, next_update)
+        return FetchResult(rates, next_update)
+    
+    def stats(self):
+        return {
+            'state': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'p95_seconds': round(self.hedge_delay(), 4),
+            'downloads': self.downloads,
+            'not_modified': self.not_modified,
+            'unchanged': self.unchanged,
+            'errors': self.errors,
+        }
+
+def configured_providers():
+    """Build the provider list from EXCHANGE_RATE_API_URL and EXCHANGE_RATE_PROVIDERS"""
+    providers = [RateProvider('primary', EXCHANGE_RATE_API_URL)]
+    for entry in EXCHANGE_RATE_PROVIDERS.split(','):
+        name, _, url = entry.strip().rpartition('=')
+        if url:
+            providers.append(RateProvider(name or f'provider-{len(providers)}', url))
+    return providers
+
+class RateFetcher:
+    """Fetch rates from the first healthy provider, hedging slow ones"""
+    
+    def __init__(self, providers, deadline=FETCH_DEADLINE):
+        self.providers = providers
+        self.deadline = deadline
+        self.hedges = 0
+        self.hedge_wins = 0
+    
+    @property
+    def demo(self):
+        # For demo purposes, use fallback rates unless a key or provider is configured
+        return (EXCHANGE_RATE_API_KEY == "YOUR_API_KEY_HERE" and
+                'EXCHANGE_RATE_API_URL' not in os.environ and
+                'EXCHANGE_RATE_PROVIDERS' not in os.environ)
+    
+    async def fetch(self, base='USD'):
+        if self.demo:
+            print("⚠️  Using demo exchange rates (get free API key from exchangerate-api.com)")
+            return FetchResult(get_fallback_rates())
+        
+        remaining = [provider for provider in self.providers if provider.breaker.allow()]
+        if not remaining:
+            raise RuntimeError("All rate providers are temporarily out of rotation")
+        
+        try:
+            async with asyncio.timeout(self.deadline):
+                return await self._hedged_fetch(base, remaining)
+        except TimeoutError:
+            raise TimeoutError(f"No rate provider answered within {self.deadline}s") from None
+    
+    async def _hedged_fetch(self, base, remaining):
+        pending = {}
+        errors = []
+        
+        def launch(hedge=False):
+            provider = remaining.pop(0)
+            pending[asyncio.ensure_future(provider.fetch(base))] = (provider, hedge)
+            return provider.hedge_delay()
+        
+        try:
+            hedge_delay = launch()
+            while pending:
+                can_hedge = remaining and len(pending) == 1
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay if can_hedge else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    launch(hedge=True)
+                    continue
+                
+                for task in done:
+                    provider, hedge = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(f"{provider.name}: {task.exception()}")
+                        continue
+                    if hedge:
+                        self.hedge_wins += 1
+                    return task.result()
+                
+                if not pending and remaining:
+                    hedge_delay = launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        raise RuntimeError(f"All rate providers failed: {'; '.join(errors)}")
+    
+    def stats(self):
+        return {
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'providers': {provider.name: provider.stats() for provider in self.providers},
+        }
+
+class SingleFlight:
+    """Coalesce concurrent calls so callers with the same key share one task"""
+    
+    def __init__(self):
+        self._tasks = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.failed = 0
+    
+    async def do(self, key, coroutine_fn):
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = self._tasks[key] = asyncio.ensure_future(coroutine_fn())
+            self.executed += 1
+            task.add_done_callback(lambda done: self._finished(key, done))
+        # Shield so one waiter being cancelled does not cancel the shared fetch
+        return await asyncio.shield(task)
+    
+    def in_flight(self, key):
+        return key in self._tasks
+    
+    def _finished(self, key, task):
+        del self._tasks[key]
+        if task.cancelled() or task.exception() is not None:
+            self.failed += 1
+    
+    def stats(self):
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'failed': self.failed,
+            'in_flight': len(self._tasks),
+        }
+
+def minor_unit_exponent(code):
+    ordinal = CURRENCIES.get(code)
+    return 2 if ordinal is None else CURRENCIES.exponent(ordinal)
+
+def round_half_even(numerator, denominator):
+    """Divide two integers (denominator > 0), rounding ties to the even neighbour"""
+    quotient, remainder = divmod(numerator, denominator)
+    twice = remainder * 2
+    if twice > denominator or (twice == denominator and quotient & 1):
+        quotient += 1
+    return quotient
+
+class FixedPointRates:
+    """Integer-only conversion of minor units using each rate's exact decimal fraction.
+    
+    Nothing is rounded until the final division, which rounds half to even.
+    """
+    
+    __slots__ = ('exponents', 'numerators', 'denominators')
+    
+    def __init__(self, rates):
+        """Build from rates against one base, indexed by registry ordinal"""
+        self.exponents = [CURRENCIES.exponent(ordinal) for ordinal in range(len(rates))]
+        fractions = [Fraction(repr(float(rate))) for rate in rates]
+        self.numerators = [rate.numerator * 10 ** exp for rate, exp in zip(fractions, self.exponents)]
+        self.denominators = [rate.denominator for rate in fractions]
+    
+    def _ordinal(self, code):
+        ordinal = CURRENCIES.get(code)
+        if ordinal is None or ordinal >= len(self.numerators) or not self.numerators[ordinal]:
+            raise ValueError(f"Unsupported currency: {code}")
+        return ordinal
+    
+    def _pair(self, f, t):
+        """Reduced numerator and denominator of the minor-unit factor from f to t"""
+        numerator = self.numerators[t] * self.denominators[f]
+        denominator = self.denominators[t] * self.numerators[f]
+        common = math.gcd(numerator, denominator)
+        return numerator // common, denominator // common
+    
+    def convert(self, amount_minor, from_currency, to_currency):
+        """Convert an integer amount of minor units, returning minor units"""
+        numerator, denominator = self._pair(self._ordinal(from_currency), self._ordinal(to_currency))
+        return round_half_even(amount_minor * numerator, denominator)
+    
+    def convert_many(self, amounts_minor, from_codes, to_codes):
+        """Convert columns of minor-unit amounts and currency codes"""
+        ordinal = {code: self._ordinal(code) for code in {*from_codes, *to_codes}}
+        pairs = {(f, t): self._pair(ordinal[f], ordinal[t]) for f, t in set(zip(from_codes, to_codes))}
+        results = []
+        append = results.append
+        for amount, f, t in zip(amounts_minor, from_codes, to_codes):
+            numerator, denominator = pairs[f, t]
+            quotient, remainder = divmod(amount * numerator, denominator)
+            twice = remainder * 2
+            if twice > denominator or (twice == denominator and quotient & 1):
+                quotient += 1
+            append(quotient)
+        return results
+
+class CrossRateMatrix:
+    """Dense N×N cross-rate table indexed by CURRENCIES ordinals, built once per snapshot"""
+    
+    __slots__ = ('base', 'size', 'available', 'cells')
+    
+    def __init__(self, rates, base='USD'):
+        if base not in rates:
+            rates = {base: 1.0, **rates}
+        ordinals = [CURRENCIES.intern(code) for code in rates]
+        self.base = CURRENCIES.ordinal(base)
+        self.size = len(CURRENCIES)
+        
+        base_rates = [0.0] * self.size
+        for ordinal, rate in zip(ordinals, rates.values()):
+            base_rates[ordinal] = float(rate)
+        self.available = tuple(ordinal for ordinal, rate in enumerate(base_rates) if rate)
+        self.cells = array('d')
+        for from_rate in base_rates:
+            if from_rate:
+                self.cells.extend([to_rate / from_rate for to_rate in base_rates])
+            else:
+                self.cells.frombytes(bytes(8 * self.size))
+    
+    def ordinal(self, code):
+        ordinal = CURRENCIES.get(code)
+        if ordinal is None or ordinal >= self.size or not self.cells[ordinal * self.size + ordinal]:
+            raise ValueError(f"Unsupported currency: {code}")
+        return ordinal
+    
+    def rate(self, from_currency, to_currency):
+        return self.cells[self.ordinal(from_currency) * self.size + self.ordinal(to_currency)]
+    
+    def rates_for(self, from_codes, to_codes):
+        """Return the cross rate for each (from, to) pair in two code columns"""
+        ordinal = {code: self.ordinal(code) for code in {*from_codes, *to_codes}}
+        cells, size = self.cells, self.size
+        return [cells[ordinal[f] * size + ordinal[t]] for f, t in zip(from_codes, to_codes)]
+    
+    def base_row(self):
+        """Return rates against the base currency, indexed by ordinal"""
+        return self.cells[self.base * self.size:(self.base + 1) * self.size]
+    
+    def row(self, base):
+        """Return every available rate quoted against ``base`` as a dict"""
+        start = self.ordinal(base) * self.size
+        codes, cells = CURRENCIES.codes, self.cells
+        return {codes[ordinal]: cells[start + ordinal] for ordinal in self.available}
+
+@dataclass(frozen=True)
+class RateSnapshot:
+    """Immutable set of exchange rates published by the RateStore"""
+    rates: Dict[str, float]
+    version: int
+    fetched_at: datetime
+    matrix: CrossRateMatrix
+    fixed: FixedPointRates
+    
+    @classmethod
+    def build(cls, rates, version, fetched_at):
+        rates = dict(rates)
+        matrix = CrossRateMatrix(rates)
+        # The quoted rates themselves, not the matrix row, which adds a float division
+        quoted = [0.0] * matrix.size
+        quoted[matrix.base] = 1.0
+        for code, rate in rates.items():
+            quoted[CURRENCIES.ordinal(code)] = float(rate)
+        return cls(rates, version, fetched_at, matrix, FixedPointRates(quoted))
+    
+    def age(self, now=None):
+        return ((now or datetime.now()) - self.fetched_at).total_seconds()
+
+SHARED_RATES_CAPACITY = 512  # Currency slots in the shared-memory rate table
+SHARED_RATES_POLL = 0.5  # Seconds between worker checks for a newly published table
+SHARED_RATES_READ_RETRIES = 1000  # Torn copies a reader tolerates before giving up on an update
+
+class SharedRateTable:
+    """The current rate snapshot in shared memory, for worker processes.
+    
+    One process writes it; readers use a seqlock and never take a lock.
+    """
+    
+    HEADER = struct.Struct('<QQdI')  # sequence, version, fetched_at, count
+    SEQUENCE = struct.Struct('<Q')
+    CODES_OFFSET = 64
+    
+    def __init__(self, memory, capacity=SHARED_RATES_CAPACITY):
+        self.memory = memory
+        self.capacity = capacity
+        rates_offset = (self.CODES_OFFSET + 3 * capacity + 7) // 8 * 8
+        self.codes = memory.buf[self.CODES_OFFSET:self.CODES_OFFSET + 3 * capacity]
+        self.rates = memory.buf[rates_offset:rates_offset + 8 * capacity].cast('d')
+        self._sequence = 0
+        self._stuck = None  # Sequence a read already gave up on
+        self.reads = 0
+        self.retries = 0
+        self.failures = 0
+    
+    @classmethod
+    def create(cls, capacity=SHARED_RATES_CAPACITY):
+        rates_offset = (cls.CODES_OFFSET + 3 * capacity + 7) // 8 * 8
+        memory = shared_memory.SharedMemory(create=True, size=rates_offset + 8 * capacity)
+        return cls(memory, capacity)
+    
+    def publish(self, snapshot):
+        """Write a snapshot into the table; only one process may call this"""
+        rates = snapshot.matrix.base_row()
+        count = len(rates)
+        if count > self.capacity:
+            raise ValueError(f"{count} currencies do not fit in the shared rate table")
+        codes = ''.join(CURRENCIES.codes[:count]).encode('ascii')
+        if len(codes) != 3 * count:
+            raise ValueError("Currency codes must be three ASCII letters")
+        fetched_at = snapshot.fetched_at.timestamp() if snapshot.version else 0.0
+        
+        buf = self.memory.buf
+        self.SEQUENCE.pack_into(buf, 0, self._sequence + 1)
+        self.codes[:3 * count] = codes
+        self.rates[:count] = rates
+        self.HEADER.pack_into(buf, 0, self._sequence + 1, snapshot.version, fetched_at, count)
+        self.SEQUENCE.pack_into(buf, 0, self._sequence + 2)
+        self._sequence += 2
+    
+    def version(self):
+        """Version of the table as last published, without a consistent read"""
+        return self.HEADER.unpack_from(self.memory.buf)[1]
+    
+    def read(self):
+        """Return (version, fetched_at, rates) from one consistent copy of the table"""
+        buf = self.memory.buf
+        for attempt in range(SHARED_RATES_READ_RETRIES):
+            sequence, version, fetched_at, count = self.HEADER.unpack_from(buf)
+            if sequence == self._stuck:
+                break
+            if not sequence & 1:
+                codes = bytes(self.codes[:3 * count])
+                rates = self.rates[:count].tolist()
+                if self.SEQUENCE.unpack_from(buf)[0] == sequence:
+                    break
+            self.retries += 1
+            time.sleep(0)
+        else:
+            self._stuck = sequence
+            print(f"⚠️  Shared rate table stuck mid-update at sequence {sequence}")
+        if sequence == self._stuck:
+            self.failures += 1
+            raise TimeoutError(f"Shared rate table stuck mid-update at sequence {sequence}")
+        self.reads += 1
+        codes = codes.decode('ascii')
+        rates = {codes[3 * i:3 * i + 3]: rate for i, rate in enumerate(rates) if rate}
+        return version, datetime.fromtimestamp(fetched_at) if version else datetime.min, rates
+    
+    def close(self, unlink=False):
+        self.codes.release()
+        self.rates.release()
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+    
+    def stats(self):
+        return {'name': self.memory.name, 'pid': os.getpid(),
+                'reads': self.reads, 'retries': self.retries, 'failures': self.failures}
+
+class RateStore:
+    """Process-wide exchange rate cache, refreshed in the background on an asyncio loop"""
+    
+    def __init__(self, fetcher, base='USD', extra_bases=(), ttl=CACHE_DURATION,
+                 refresh_ahead=REFRESH_AHEAD, retry_interval=RETRY_INTERVAL):
+        self.fetcher = fetcher
+        self.base = base
+        self.extra_bases = [extra for extra in extra_bases if extra != base]
+        self.flight = SingleFlight()
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.retry_interval = retry_interval
+        self._snapshot = RateSnapshot.build(get_fallback_rates(), 0, datetime.min)
+        self._base_rates = {}  # Latest rates received for each base
+        self._last_attempt = 0.0
+        self._checked_at = datetime.min
+        self._next_update = None
+        self._loop = None
+        self._wakeup = None
+        self._thread = None
+        self._listeners = []
+        self._shared = None
+        self._notified = None  # Last shared version listeners were told about
+        self._adopt_lock = threading.Lock()
+    
+    def add_listener(self, listener, owner_only=False):
+        """Call listener(snapshot) on every publish; owner_only listeners skip workers"""
+        self._listeners.append((listener, owner_only))
+    
+    def restore(self, snapshot):
+        """Adopt a previously persisted snapshot if it is newer than the current one"""
+        if snapshot is not None and snapshot.version > self._snapshot.version:
+            self._snapshot = snapshot
+            self._checked_at = snapshot.fetched_at
+    
+    def snapshot(self):
+        """Return the current snapshot, kicking off a refresh if it is stale"""
+        if self._shared is not None:
+            self._adopt_shared()
+        snapshot = self._snapshot
+        if (self._loop is not None and datetime.now() >= self.fresh_until() and
+            time.monotonic() - self._last_attempt >= self.retry_interval):
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return snapshot
+    
+    def fresh_until(self):
+        if self._next_update is not None:
+            return self._next_update
+        return self._checked_at + timedelta(seconds=self.ttl)
+    
+    def refresh(self):
+        """Fetch and publish new rates from any thread, returning True on success"""
+        if self._loop is None:
+            return asyncio.run(self._refresh())  # No shared loop, so nothing to coalesce with
+        return asyncio.run_coroutine_threadsafe(self.refresh_async(), self._loop).result()
+    
+    async def refresh_async(self):
+        """Refresh rates, or wait for the refresh already in flight and share its outcome"""
+        return await self.flight.do('refresh', self._refresh)
+    
+    async def _refresh(self):
+        self._last_attempt = time.monotonic()
+        try:
+            bases = [self.base, *self.extra_bases]
+            results = await asyncio.gather(*(self.fetcher.fetch(base) for base in bases),
+                                           return_exceptions=True)
+            if isinstance(results[0], BaseException):
+                raise results[0]
+            
+            changed = False
+            for base, result in zip(bases, results):
+                if isinstance(result, BaseException):
+                    print(f"⚠️  Error fetching {base} exchange rates: {result}")
+                elif result.rates is not None:
+                    self._base_rates[base] = result.rates
+                    changed = True
+            if changed:
+                # Listeners do blocking I/O, so keep them off the event loop
+                await asyncio.to_thread(self._publish, self._merged_rates())
+            
+            self._checked_at = datetime.now()
+            self._next_update = results[0].next_update
+            return True
+        except Exception as e:
+            print(f"Error fetching exchange rates: {e}")
+            return False
+    
+    def _merged_rates(self):
+        """Rates for the main base, filling gaps by triangulating through other bases"""
+        rates = dict(self._base_rates.get(self.base) or self._snapshot.rates)
+        for base in self.extra_bases:
+            other = self._base_rates.get(base)
+            if not other or not rates.get(base):
+                continue
+            for code, rate in other.items():
+                rates.setdefault(code, rates[base] * rate)
+        return rates
+    
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version,
+            'age_seconds': round(snapshot.age(), 3) if snapshot.version else None,
+            'refreshing': self.flight.in_flight('refresh'),
+            'fresh_until': self.fresh_until().isoformat() if self._snapshot.version else None,
+            'refreshes': self.flight.stats(),
+            'shared': self._shared.stats() if self._shared is not None else None,
+        }
+    
+    def _publish(self, rates):
+        previous = self._snapshot
+        snapshot = RateSnapshot.build(rates, previous.version + 1, datetime.now())
+        self._snapshot = snapshot
+        self._notify(snapshot)
+    
+    def _notify(self, snapshot, owner=True):
+        for listener, owner_only in self._listeners:
+            if owner_only and not owner:
+                continue
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"⚠️  Rate listener failed: {e}")
+    
+    def follow(self, table):
+        """Serve the snapshots another process publishes into ``table`` instead of fetching"""
+        if self._thread is not None:
+            return
+        self._shared = table
+        self._notified = self._snapshot.version
+        self._notify_shared()
+        self._thread = threading.Thread(target=self._follow_shared, name='rate-follower', daemon=True)
+        self._thread.start()
+    
+    def _follow_shared(self):
+        while True:
+            time.sleep(SHARED_RATES_POLL)
+            self._notify_shared()
+    
+    def _notify_shared(self):
+        # Requests adopt new tables as they arrive, but listeners only run
+        # here: a request adopting while it holds a listener's lock (an SSE
+        # subscribe, say) would otherwise deadlock on it
+        self._adopt_shared()
+        snapshot = self._snapshot
+        if snapshot.version != self._notified:
+            self._notified = snapshot.version
+            self._notify(snapshot, owner=False)
+    
+    def _adopt_shared(self):
+        if self._shared.version() == self._snapshot.version:
+            return
+        with self._adopt_lock:
+            try:
+                version, fetched_at, rates = self._shared.read()
+            except TimeoutError:
+                return  # Keep serving the last table we could read
+            if version == self._snapshot.version:
+                return
+            self._snapshot = RateSnapshot.build(rates, version, fetched_at)
+            self._checked_at = datetime.now()
+    
+    def start(self):
+        """Start the refresher loop, fetching first unless a fresh snapshot was restored"""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._wakeup = asyncio.Event()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='rate-refresher', daemon=True)
+        self._thread.start()
+        if self._snapshot.version == 0 or self._next_delay(True) == 0:
+            self.refresh()
+        asyncio.run_coroutine_threadsafe(self._schedule(), self._loop)
+    
+    async def _schedule(self):
+        delay = self._next_delay(True)
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            delay = self._next_delay(await self.refresh_async())
+    
+    def _next_delay(self, succeeded):
+        if not succeeded or self._snapshot.version == 0:
+            return self.retry_interval * random.uniform(1, 1 + REFRESH_JITTER)
+        now = datetime.now()
+        if self._next_update is not None:
+            # Ask again shortly after the provider publishes, or retry if it is late
+            if self._next_update <= now:
+                return self.retry_interval * random.uniform(1, 1 + REFRESH_JITTER)
+            return (self._next_update - now).total_seconds() + PROVIDER_UPDATE_MARGIN * random.uniform(1, 2)
+        remaining = self.ttl * self.refresh_ahead - (now - self._checked_at).total_seconds()
+        return max(remaining, 0) * random.uniform(1 - REFRESH_JITTER, 1)
+
+RATE_FETCHER = RateFetcher(configured_providers())
+RATE_STORE = RateStore(RATE_FETCHER, extra_bases=EXCHANGE_RATE_EXTRA_BASES)
+
+class ConnectionPool:
+    """Small pool of pre-configured SQLite connections, one per thread at a time"""
+    
+    def __init__(self, path=DATABASE_PATH, max_connections=DB_POOL_SIZE):
+        self.path = path
+        self.max_connections = max_connections
+        self._idle = []
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self.created = 0
+        self.checkouts = 0
+        self.reuses = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # DatabaseMaintenance checkpoints well before this; it only bounds the WAL if that stops
+        conn.execute(f'PRAGMA wal_autocheckpoint={DB_WAL_AUTOCHECKPOINT}')
+        conn.execute(f'PRAGMA cache_size=-{DB_CACHE_KIB}')
+        conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Check out this thread's connection for the duration of the block"""
+        local = self._local
+        if getattr(local, 'conn', None) is not None:
+            local.depth += 1
+            try:
+                yield local.conn
+            finally:
+                local.depth -= 1
+            return
+        
+        local.conn = self._acquire()
+        local.depth = 1
+        try:
+            yield local.conn
+        finally:
+            conn, local.conn = local.conn, None
+            if conn.in_transaction:
+                conn.rollback()
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+    
+    @contextmanager
+    def read_only(self):
+        """A private read-only connection for long scans that should not hold a pooled one"""
+        conn = sqlite3.connect(f'file:{urllib.parse.quote(os.path.abspath(self.path))}?mode=ro',
+                               uri=True, check_same_thread=False)
+        try:
+            conn.execute(f'PRAGMA cache_size=-{DB_CACHE_KIB}')
+            conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+            yield conn
+        finally:
+            conn.close()
+    
+    def _acquire(self):
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while not self._idle and self.created >= self.max_connections:
+                waited = True
+                self._cond.wait()
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_seconds += time.monotonic() - started
+            if self._idle:
+                self.reuses += 1
+                return self._idle.pop()
+            self.created += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self.created -= 1
+                self._cond.notify()
+            raise
+    
+    def close(self):
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self.created -= 1
+    
+    def stats(self):
+        with self._cond:
+            return {
+                'open': self.created,
+                'idle': len(self._idle),
+                'max': self.max_connections,
+                'checkouts': self.checkouts,
+                'reuses': self.reuses,
+                'waits': self.waits,
+                'wait_seconds': round(self.wait_seconds, 6),
+            }
+
+DB_POOL = ConnectionPool()
+
+RATE_SNAPSHOT_FILE = 'rate_snapshot.bin'
+RATE_SNAPSHOT_KEEP = 48  # Newest snapshots kept in the rate_snapshots table
+
+class SnapshotArchive:
+    """Persist published rate snapshots for an instant warm start"""
+    
+    MAGIC = b'FXRS'
+    FORMAT = 1
+    HEADER = struct.Struct('<4sHQdI')  # magic, format, version, fetched_at, count
+    
+    def __init__(self, pool, path=RATE_SNAPSHOT_FILE, keep=RATE_SNAPSHOT_KEEP):
+        self.pool = pool
+        self.path = path
+        self.keep = keep
+    
+    @classmethod
+    def encode(cls, snapshot):
+        codes = list(snapshot.rates)
+        if any(len(code.encode('ascii')) != 3 for code in codes):
+            raise ValueError("Currency codes must be three ASCII letters")
+        header = cls.HEADER.pack(cls.MAGIC, cls.FORMAT, snapshot.version,
+                                 snapshot.fetched_at.timestamp(), len(codes))
+        values = array('d', snapshot.rates.values())
+        return header + ''.join(codes).encode('ascii') + values.tobytes()
+    
+    @classmethod
+    def decode(cls, data):
+        magic, fmt, version, fetched_at, count = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or fmt != cls.FORMAT:
+            raise ValueError("Not a rate snapshot")
+        offset = cls.HEADER.size
+        codes = data[offset:offset + 3 * count].decode('ascii')
+        values = array('d')
+        values.frombytes(data[offset + 3 * count:offset + 11 * count])
+        rates = {codes[i:i + 3]: rate for i, rate in zip(range(0, 3 * count, 3), values)}
+        return RateSnapshot.build(rates, version, datetime.fromtimestamp(fetched_at))
+    
+    def save(self, snapshot):
+        data = self.encode(snapshot)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, self.path)
+        
+        with self.pool.connection() as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_snapshots (version, fetched_at, data) VALUES (?, ?, ?)',
+                (snapshot.version, snapshot.fetched_at.isoformat(sep=' '), data)
+            )
+            conn.execute(
+                'DELETE FROM rate_snapshots WHERE version <= '
+                '(SELECT version FROM rate_snapshots ORDER BY version DESC LIMIT 1 OFFSET ?)',
+                (self.keep,)
+            )
+    
+    def load(self):
+        """Return the newest persisted snapshot, or None if there is none"""
+        try:
+            with open(self.path, 'rb') as f:
+                return self.decode(f.read())
+        except (OSError, ValueError, struct.error):
+            pass
+        
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    'SELECT data FROM rate_snapshots ORDER BY version DESC LIMIT 1'
+                ).fetchone()
+            return self.decode(row[0]) if row else None
+        except (sqlite3.Error, ValueError, struct.error) as e:
+            print(f"⚠️  Could not load saved rates: {e}")
+            return None
+
+SNAPSHOT_ARCHIVE = SnapshotArchive(DB_POOL)
+RATE_STORE.add_listener(SNAPSHOT_ARCHIVE.save, owner_only=True)
+
+RATE_HISTORY_DIR = 'rate_history'
+RATE_HISTORY_MAX_POINTS = 2000  # Points returned when no step is requested
+
+class RateHistory:
+    """Time series of published snapshots, one float64 column file per currency"""
+    
+    def __init__(self, directory=RATE_HISTORY_DIR, persist=True):
+        self.directory = directory
+        self.persist = persist  # Workers keep the series in memory and leave the files to the refresher
+        self.timestamps = array('d')
+        self.columns = {}
+        self._lock = threading.Lock()
+    
+    def _column_path(self, code):
+        return os.path.join(self.directory, f'{code}.f64')
+    
+    def load(self):
+        timestamps_path = os.path.join(self.directory, 'timestamps.f64')
+        if not os.path.exists(timestamps_path):
+            return
+        with self._lock:
+            self.timestamps = self._read_column(timestamps_path)
+            for name in os.listdir(self.directory):
+                code, ext = os.path.splitext(name)
+                if ext == '.f64' and code != 'timestamps':
+                    self.columns[code] = self._read_column(self._column_path(code))
+            
+            # A crash mid-append leaves some files a point ahead of the others;
+            # cut every file back to the last point all of them hold, so later
+            # appends land aligned again
+            count = min(len(self.timestamps), *(len(column) for column in self.columns.values()))
+            paths = [(timestamps_path, self.timestamps)]
+            paths.extend((self._column_path(code), column) for code, column in self.columns.items())
+            for path, column in paths:
+                if os.path.getsize(path) != count * column.itemsize:
+                    del column[count:]
+                    if self.persist:
+                        os.truncate(path, count * column.itemsize)
+    
+    @staticmethod
+    def _read_column(path):
+        column = array('d')
+        with open(path, 'rb') as f:
+            data = f.read()
+        column.frombytes(data[:len(data) - len(data) % column.itemsize])
+        return column
+    
+    def append(self, snapshot):
+        """Record a published snapshot at the end of every column"""
+        timestamp = snapshot.fetched_at.timestamp()
+        with self._lock:
+            if self.timestamps and timestamp <= self.timestamps[-1]:
+                return
+            if self.persist:
+                os.makedirs(self.directory, exist_ok=True)
+            count = len(self.timestamps)
+            
+            for code in snapshot.rates.keys() - self.columns.keys():
+                # Currencies seen for the first time are NaN for earlier points
+                self.columns[code] = array('d', [math.nan] * count)
+                if self.persist:
+                    with open(self._column_path(code), 'wb') as f:
+                        self.columns[code].tofile(f)
+            
+            for code, column in self.columns.items():
+                value = array('d', [snapshot.rates.get(code, math.nan)])
+                column.extend(value)
+                if self.persist:
+                    with open(self._column_path(code), 'ab') as f:
+                        value.tofile(f)
+            
+            self.timestamps.append(timestamp)
+            if self.persist:
+                with open(os.path.join(self.directory, 'timestamps.f64'), 'ab') as f:
+                    array('d', [timestamp]).tofile(f)
+    
+    def query(self, from_currency, to_currency, start=None, end=None, step=None):
+        """Return (timestamps, rates) for a pair, last value per step bucket"""
+        with self._lock:
+            timestamps = self.timestamps
+            from_column = self.columns.get(from_currency)
+            to_column = self.columns.get(to_currency)
+            for code, column in ((from_currency, from_column), (to_currency, to_column)):
+                if column is None:
+                    raise ValueError(f"No rate history for {code}")
+            
+            lo = bisect.bisect_left(timestamps, start) if start is not None else 0
+            hi = bisect.bisect_left(timestamps, end) if end is not None else len(timestamps)
+            if hi <= lo:
+                return [], []
+            
+            if step is None and hi - lo > RATE_HISTORY_MAX_POINTS:
+                step = (timestamps[hi - 1] - timestamps[lo]) / RATE_HISTORY_MAX_POINTS
+            
+            if step:
+                # Index of the last point in each bucket of width step
+                indexes = []
+                bucket_end = timestamps[lo] + step
+                i = lo
+                while i < hi:
+                    i = bisect.bisect_left(timestamps, bucket_end, i, hi)
+                    indexes.append(i - 1)
+                    if i < hi:
+                        bucket_end += step * (1 + (timestamps[i] - bucket_end) // step)
+            else:
+                indexes = range(lo, hi)
+            
+            points_t = []
+            points_r = []
+            for i in indexes:
+                from_rate = from_column[i]
+                rate = to_column[i] / from_rate if from_rate else math.nan
+                if not math.isnan(rate):
+                    points_t.append(timestamps[i])
+                    points_r.append(rate)
+            return points_t, points_r
+
+RATE_HISTORY = RateHistory()
+RATE_STORE.add_listener(RATE_HISTORY.append)
+
+def parse_time_param(value):
+    """Accept epoch seconds or an ISO timestamp and return epoch seconds"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+
+def parse_step_param(value):
+    """Accept a step in seconds, optionally suffixed with s, m, h or d"""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    multiplier = units.get(value[-1:].lower())
+    number = value[:-1] if multiplier else value
+    try:
+        step = float(number) * (multiplier or 1)
+    except ValueError:
+        raise ValueError(f"Invalid step: {value}")
+    if step <= 0:
+        raise ValueError("step must be positive")
+    return step
+
+PARTITION_ID_SPAN = 10 ** 10  # History ids are partition key * span + row id within the partition
+
+def partition_key(timestamp):
+    """Monthly partition key, such as 202610, for a stored UTC timestamp"""
+    return int(timestamp[:4] + timestamp[5:7])
+
+def partition_table(key):
+    return f'conversions_{key}'
+
+def conversion_partitions(conn):
+    """Keys of the existing monthly history partitions, newest first"""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' "
+        "AND name GLOB 'conversions_[0-9][0-9][0-9][0-9][0-9][0-9]'"
+    )
+    return sorted((int(name[len('conversions_'):]) for name, in rows), reverse=True)
+
+def create_partition(conn, key):
+    table = partition_table(key)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            amount REAL NOT NULL,
+            from_currency TEXT NOT NULL,
+            to_currency TEXT NOT NULL,
+            result REAL NOT NULL,
+            rate REAL NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_pair_timestamp '
+                 f'ON {table} (from_currency, to_currency, timestamp)')
+
+ROLLUP_BINS_PER_DECADE = 50  # Amount histogram resolution, about 4.7% per bin
+ROLLUP_MIN_BIN = -6 * ROLLUP_BINS_PER_DECADE  # Amounts below 1e-6 share the lowest bin
+ROLLUP_MAX_BIN = 15 * ROLLUP_BINS_PER_DECADE  # Amounts above 1e15 share the highest bin
+
+def rollup_buckets(timestamp):
+    """Return the (grain, bucket) pairs a stored UTC timestamp rolls up into"""
+    return (('hour', timestamp[:13] + ':00'), ('day', timestamp[:10]))
+
+def amount_bin(amount):
+    """Log-scale histogram bin for an amount"""
+    if not amount > 0:
+        return ROLLUP_MIN_BIN
+    return min(max(math.floor(math.log10(amount) * ROLLUP_BINS_PER_DECADE), ROLLUP_MIN_BIN), ROLLUP_MAX_BIN)
+
+def rollup_batch(records):
+    """Aggregate history records into rows for the pair and amount rollup upserts"""
+    pairs = {}
+    amounts = {}
+    for amount, from_currency, to_currency, result, rate, timestamp in records:
+        bin_ = amount_bin(amount)
+        for grain, bucket in rollup_buckets(timestamp):
+            totals = pairs.setdefault((grain, bucket, from_currency, to_currency), [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += amount
+            totals[2] += result
+            key = (grain, bucket, from_currency, bin_)
+            amounts[key] = amounts.get(key, 0) + 1
+    return ([(*key, *totals) for key, totals in pairs.items()],
+            [(*key, count) for key, count in amounts.items()])
+
+class HistoryWriter:
+    """Write conversion history and its rollups to SQLite in batches from one thread"""
+    
+    INSERT_SQL = (
+        'INSERT INTO {table} (amount, from_currency, to_currency, result, rate, timestamp) '
+        'VALUES (?, ?, ?, ?, ?, ?)'
+    )
+    PAIR_ROLLUP_SQL = (
+        'INSERT INTO conversion_rollups '
+        '(grain, bucket, from_currency, to_currency, conversions, amount_total, result_total) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT (grain, bucket, from_currency, to_currency) DO UPDATE SET '
+        'conversions = conversions + excluded.conversions, '
+        'amount_total = amount_total + excluded.amount_total, '
+        'result_total = result_total + excluded.result_total'
+    )
+    AMOUNT_ROLLUP_SQL = (
+        'INSERT INTO amount_histogram (grain, bucket, currency, bin, conversions) '
+        'VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT (grain, bucket, currency, bin) DO UPDATE SET '
+        'conversions = conversions + excluded.conversions'
+    )
+    
+    def write_records(self, conn, records):
+        by_partition = {}
+        for record in records:
+            by_partition.setdefault(partition_key(record[5]), []).append(record)
+        for key, partition_records in by_partition.items():
+            if key not in self._partitions:
+                create_partition(conn, key)
+                self._partitions.add(key)
+            conn.executemany(self.INSERT_SQL.format(table=partition_table(key)), partition_records)
+    
+    @classmethod
+    def write_rollups(cls, conn, records):
+        pair_rows, amount_rows = rollup_batch(records)
+        conn.executemany(cls.PAIR_ROLLUP_SQL, pair_rows)
+        conn.executemany(cls.AMOUNT_ROLLUP_SQL, amount_rows)
+    
+    def __init__(self, pool, max_queue=HISTORY_QUEUE_SIZE,
+                 batch_size=HISTORY_BATCH_SIZE, flush_interval=HISTORY_FLUSH_INTERVAL):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._partitions = set()
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+    
+    def submit(self, record):
+        """Queue a record for writing, returning False if the queue is full"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+    
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+    
+    def close(self):
+        """Write everything still queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self.queue.put(None)
+        self._thread.join()
+        self._thread = None
+    
+    def _run(self):
+        running = True
+        while running:
+            batch, running = self._next_batch()
+            if not batch:
+                continue
+            try:
+                with self.pool.connection() as conn, conn:
+                    self.write_records(conn, batch)
+                    self.write_rollups(conn, batch)
+                self.written += len(batch)
+                self.batches += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"⚠️  Failed to write {len(batch)} history records: {e}")
+    
+    def _next_batch(self):
+        """Block for one record, then gather more until the batch fills or times out"""
+        record = self.queue.get()
+        if record is None:
+            return [], False
+        batch = [record]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                record = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is None:
+                return batch, False
+            batch.append(record)
+        return batch, True
+    
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'capacity': self.queue.maxsize,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors,
+        }
+
+HISTORY_WRITER = HistoryWriter(DB_POOL)
+
+def parse_hour_range(value):
+    """Parse an hour window such as '2-5' into (start, end), end exclusive and allowed to wrap"""
+    start, _, end = value.partition('-')
+    start, end = int(start), int(end or int(start) + 1)
+    if not (0 <= start < 24 and 0 <= end <= 24):
+        raise ValueError(f"Invalid hour range: {value}")
+    return start, end
+
+class DatabaseMaintenance:
+    """Checkpoint the WAL and, off-peak, drop expired partitions and vacuum"""
+    
+    def __init__(self, pool, retention_months=HISTORY_RETENTION_MONTHS,
+                 interval=DB_MAINTENANCE_INTERVAL, hours=DB_MAINTENANCE_HOURS):
+        self.pool = pool
+        self.retention_months = retention_months
+        self.interval = interval
+        self.hours = parse_hour_range(hours)
+        self._thread = None
+        self.checkpoints = 0
+        self.dropped_partitions = 0
+        self.vacuumed_pages = 0
+        self.last_compaction = None
+    
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                # Keep going whatever failed; the WAL is only checkpointed from here
+                print(f"⚠️  Database maintenance failed: {e}")
+    
+    def off_peak(self, now=None):
+        hour = (now or datetime.now(timezone.utc)).hour
+        start, end = self.hours
+        return start <= hour < end if start <= end else hour >= start or hour < end
+    
+    def run_once(self, now=None, force=False):
+        now = now or datetime.now(timezone.utc)
+        with self.pool.connection() as conn:
+            conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+            self.checkpoints += 1
+            if not (force or self.off_peak(now)):
+                return
+            if self.last_compaction is not None and self.last_compaction.date() == now.date() and not force:
+                return  # Once per off-peak window is plenty
+            self.drop_expired(conn, now)
+            self.vacuum(conn)
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self.last_compaction = now
+    
+    def retention_cutoff(self, now):
+        """Oldest partition key still kept, or None to keep everything"""
+        if self.retention_months <= 0:
+            return None
+        months = now.year * 12 + now.month - 1 - (self.retention_months - 1)
+        return (months // 12) * 100 + months % 12 + 1
+    
+    def drop_expired(self, conn, now):
+        cutoff = self.retention_cutoff(now)
+        if cutoff is None:
+            return
+        for key in conversion_partitions(conn):
+            if key < cutoff:
+                with conn:
+                    conn.execute(f'DROP TABLE {partition_table(key)}')
+                self.dropped_partitions += 1
+                print(f"🧹 Dropped expired history partition {key}")
+    
+    def vacuum(self, conn):
+        # Small steps, so the history writer only ever waits for one of them
+        while conn.execute('PRAGMA freelist_count').fetchone()[0]:
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            conn.execute(f'PRAGMA incremental_vacuum({DB_VACUUM_STEP_PAGES})').fetchall()
+            freed = before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if freed <= 0:
+                break
+            self.vacuumed_pages += freed
+            time.sleep(0.01)
+    
+    def stats(self):
+        return {
+            'retention_months': self.retention_months,
+            'off_peak_hours': '%d-%d' % self.hours,
+            'checkpoints': self.checkpoints,
+            'dropped_partitions': self.dropped_partitions,
+            'vacuumed_pages': self.vacuumed_pages,
+            'last_compaction': self.last_compaction.isoformat() if self.last_compaction else None,
+        }
+
+DB_MAINTENANCE = DatabaseMaintenance(DB_POOL)
+
+SSE_HEARTBEAT = 15  # Seconds between keep-alive comments on idle streams
+SSE_BACKLOG = 256  # Past events kept for clients resuming with Last-Event-ID
+SSE_MAX_BUFFER = 1024 * 1024  # Unsent bytes allowed before a slow client is dropped
+
+class RateBroadcaster:
+    """Fan rate updates out to Server-Sent Events clients from one selector thread"""
+    
+    class _Client:
+        __slots__ = ('sock', 'buffer')
+        
+        def __init__(self, sock, buffer):
+            self.sock = sock
+            self.buffer = bytearray(buffer)
+    
+    def __init__(self, store, heartbeat=SSE_HEARTBEAT, backlog=SSE_BACKLOG):
+        self.store = store
+        self.heartbeat = heartbeat
+        self._events = deque(maxlen=backlog)
+        self._last_rates = None
+        self._clients = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._selector = None
+        self._wake_recv = self._wake_send = None
+        self._thread = None
+        self.published = 0
+        self.dropped = 0
+    
+    @staticmethod
+    def format_event(event_id, event, data):
+        return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'.encode()
+    
+    def publish(self, snapshot):
+        """Queue the currencies that changed in a snapshot for every subscriber"""
+        with self._lock:
+            previous = self._last_rates or {}
+            self._last_rates = snapshot.rates
+            changed = {code: rate for code, rate in snapshot.rates.items()
+                       if previous.get(code) != rate}
+            removed = [code for code in previous if code not in snapshot.rates]
+            event = self.format_event(snapshot.version, 'rates', {
+                'version': snapshot.version,
+                'changed': changed,
+                'removed': removed,
+            })
+            self._events.append((snapshot.version, event))
+            for client in self._clients.values():
+                client.buffer += event
+            self.published += 1
+        self._wake()
+    
+    def subscribe(self, sock, last_event_id=None):
+        """Take ownership of a client socket whose stream headers are already sent"""
+        # Taken before the lock: snapshot() may publish to this broadcaster
+        snapshot = self.store.snapshot()
+        with self._lock:
+            backlog = self._backlog(last_event_id, snapshot)
+            if backlog is None:
+                backlog = self.format_event(snapshot.version, 'snapshot', {
+                    'version': snapshot.version,
+                    'rates': snapshot.rates,
+                })
+            self._pending.append(self._Client(sock, b'retry: 5000\n\n' + backlog))
+        self._wake()
+    
+    def _backlog(self, last_event_id, snapshot):
+        """Events after last_event_id, or None if they are no longer all kept"""
+        if last_event_id is None:
+            return None
+        current = self._events[-1][0] if self._events else snapshot.version
+        if last_event_id == current:
+            return b''
+        if last_event_id > current:
+            return None  # Versions restarted; the client's table has a different baseline
+        if not self._events or self._events[0][0] > last_event_id + 1:
+            return None
+        return b''.join(event for version, event in self._events if version > last_event_id)
+    
+    def _wake(self):
+        if self._wake_send is None:
+            return  # Not started, so there is no loop to wake
+        try:
+            self._wake_send.send(b'\0')
+        except BlockingIOError:
+            pass  # A wake-up is already pending
+    
+    def start(self):
+        if self._thread is not None:
+            return
+        self._last_rates = self.store.snapshot().rates
+        # Created here rather than at import so forked workers each get their own
+        self._selector = selectors.DefaultSelector()
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        self._selector.register(self._wake_recv, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._run, name='rate-broadcaster', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        next_heartbeat = time.monotonic() + self.heartbeat
+        while True:
+            timeout = max(next_heartbeat - time.monotonic(), 0)
+            for key, mask in self._selector.select(timeout):
+                if key.fileobj is self._wake_recv:
+                    try:
+                        while self._wake_recv.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif mask & selectors.EVENT_READ:
+                    self._read(key.data)
+            
+            with self._lock:
+                for client in self._pending:
+                    client.sock.setblocking(False)
+                    self._clients[client.sock.fileno()] = client
+                    self._selector.register(client.sock, selectors.EVENT_READ, client)
+                self._pending.clear()
+                
+                if time.monotonic() >= next_heartbeat:
+                    for client in self._clients.values():
+                        client.buffer += b': heartbeat\n\n'
+                    next_heartbeat = time.monotonic() + self.heartbeat
+                
+                for client in list(self._clients.values()):
+                    self._flush(client)
+    
+    def _read(self, client):
+        # Clients never send anything on an event stream, so readable means closed
+        try:
+            data = client.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            with self._lock:
+                self._drop(client)
+    
+    def _flush(self, client):
+        if client.sock.fileno() not in self._clients:
+            return
+        try:
+            while client.buffer:
+                sent = client.sock.send(client.buffer)
+                del client.buffer[:sent]
+        except (BlockingIOError, InterruptedError):
+            if len(client.buffer) > SSE_MAX_BUFFER:
+                self._drop(client)
+            else:
+                self._selector.modify(client.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, client)
+            return
+        except OSError:
+            self._drop(client)
+            return
+        self._selector.modify(client.sock, selectors.EVENT_READ, client)
+    
+    def _drop(self, client):
+        if self._clients.pop(client.sock.fileno(), None) is None:
+            return
+        self._selector.unregister(client.sock)
+        try:
+            client.sock.close()
+        finally:
+            self.dropped += 1
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._clients) + len(self._pending),
+                'published': self.published,
+                'dropped': self.dropped,
+                'backlog': len(self._events),
+            }
+
+RATE_BROADCASTER = RateBroadcaster(RATE_STORE)
+RATE_STORE.add_listener(RATE_BROADCASTER.publish)
+
+@dataclass(frozen=True)
+class EncodedResponse:
+    """A JSON response body serialized and gzipped once, with strong ETags"""
+    body: bytes
+    gzipped: bytes
+    etag: str
+    
+    @classmethod
+    def from_payload(cls, payload):
+        body = json.dumps(payload).encode()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        return cls(body, gzip.compress(body, mtime=0), f'"{digest}"')
+    
+    @property
+    def gzip_etag(self):
+        # Each representation needs its own strong validator
+        return self.etag[:-1] + '-gz"'
+
+class ResponseCache:
+    """Encoded responses for the newest rate version seen"""
+    
+    def __init__(self):
+        self._version = None
+        self._entries = {}
+        self.builds = 0
+        self.hits = 0
+    
+    def get(self, version, key, build):
+        entries = self._entries
+        if self._version is not None and version < self._version:
+            self.builds += 1
+            return EncodedResponse.from_payload(build())
+        if self._version != version:
+            entries = {}
+            self._entries, self._version = entries, version
+        encoded = entries.get(key)
+        if encoded is None:
+            encoded = entries[key] = EncodedResponse.from_payload(build())
+            self.builds += 1
+        else:
+            self.hits += 1
+        return encoded
+    
+    def stats(self):
+        return {'version': self._version, 'entries': len(self._entries),
+                'builds': self.builds, 'hits': self.hits}
+
+RESPONSE_CACHE = ResponseCache()
+
+CONVERSION_CACHE_SIZE = 4096  # Most distinct conversions kept per rate version
+
+class ConversionCache:
+    """Bounded LRU of encoded conversion responses for the newest rate version seen"""
+    
+    def __init__(self, capacity=CONVERSION_CACHE_SIZE):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self._version = None
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, version, key, build):
+        with self.lock:
+            if self._version is None or version > self._version:
+                if self._version is not None:
+                    self.invalidations += 1
+                self._entries, self._version = OrderedDict(), version
+            encoded = self._entries.get(key) if version == self._version else None
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return encoded
+            self.misses += 1
+        
+        encoded = EncodedResponse.from_payload(build())
+        with self.lock:
+            if self._version == version:
+                self._entries[key] = encoded
+                if len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return encoded
+    
+    def stats(self):
+        with self.lock:
+            return {'version': self._version, 'entries': len(self._entries),
+                    'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'invalidations': self.invalidations}
+
+CONVERSION_CACHE = ConversionCache()
+
+RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND', 20))  # Sustained API requests per client; 0 disables limiting
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 100))  # Requests a client may make back to back
+RATE_LIMIT_API_KEYS = frozenset(  # X-API-Key values that get their own bucket
+    key.strip() for key in os.environ.get('RATE_LIMIT_API_KEYS', '').split(',') if key.strip()
+)
+RATE_LIMIT_SHARDS = 16  # Independently locked slices of the client table
+RATE_LIMIT_PRUNE_EVERY = 1024  # Requests to a shard between sweeps for idle clients
+
+class TokenBucketLimiter:
+    """Per-client token buckets spread over separately locked shards"""
+    
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST, shards=RATE_LIMIT_SHARDS):
+        self.rate = rate
+        self.burst = burst
+        self._shards = [(threading.Lock(), {}) for _ in range(shards)]
+        self._requests = [0] * shards
+        self._allowed = [0] * shards  # Per shard, so each is guarded by its shard's lock
+        self._rejected = [0] * shards
+    
+    @property
+    def enabled(self):
+        return self.rate > 0 and self.burst > 0
+    
+    def acquire(self, client, now=None):
+        """Take a token for client; return 0 if allowed, else seconds until one is free"""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        index = hash(client) % len(self._shards)
+        lock, buckets = self._shards[index]
+        with lock:
+            bucket = buckets.get(client)
+            if bucket is None:
+                tokens = float(self.burst)
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            
+            self._requests[index] += 1
+            if self._requests[index] % RATE_LIMIT_PRUNE_EVERY == 0:
+                self._prune(buckets, now)
+            
+            if tokens >= 1:
+                buckets[client] = [tokens - 1, now]
+                self._allowed[index] += 1
+                return 0.0
+            buckets[client] = [tokens, now]
+            self._rejected[index] += 1
+            return (1 - tokens) / self.rate
+    
+    def _prune(self, buckets, now):
+        full_after = self.burst / self.rate
+        for client in [client for client, (_, updated) in buckets.items() if now - updated >= full_after]:
+            del buckets[client]
+    
+    def stats(self):
+        clients = allowed = rejected = 0
+        for index, (lock, buckets) in enumerate(self._shards):
+            with lock:
+                clients += len(buckets)
+                allowed += self._allowed[index]
+                rejected += self._rejected[index]
+        return {'enabled': self.enabled, 'rate': self.rate, 'burst': self.burst,
+                'shards': len(self._shards), 'clients': clients,
+                'allowed': allowed, 'rejected': rejected}
+
+RATE_LIMITER = TokenBucketLimiter()
+
+def negotiate_encoding(accept_encoding, offered=('gzip',)):
+    """Pick the first offered content coding the client accepts, or None"""
+    accepted = {}
+    for coding in accept_encoding.split(','):
+        name, _, params = coding.partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name] = quality
+    for coding in offered:
+        if accepted.get(coding, accepted.get('*', 0.0)) > 0:
+            return coding
+    return None
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header matches the given strong ETag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+RATES_MAX_AGE = 60  # Seconds clients may reuse rate responses without revalidating
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+class StaticAsset:
+    """A front-end file encoded and compressed once at startup"""
+    
+    CONTENT_TYPES = {
+        '.html': 'text/html; charset=utf-8',
+        '.css': 'text/css; charset=utf-8',
+        '.js': 'application/javascript; charset=utf-8',
+    }
     
-    # Cache for exchange rates (to avoid hitting API too frequently)
-    exchange_rates_cache = {}
-    cache_timestamp = None
-    CACHE_DURATION = 3600  # Cache for 1 hour
-    
-    # Popular currencies with their symbols
-    POPULAR_CURRENCIES = {
-        'USD': {'name': 'US Dollar', 'symbol': '$'},
-        'EUR': {'name': 'Euro', 'symbol': '€'},
-        'GBP': {'name': 'British Pound', 'symbol': '£'},
-        'JPY': {'name': 'Japanese Yen', 'symbol': '¥'},
-        'CAD': {'name': 'Canadian Dollar', 'symbol': 'CA$'},
-        'AUD': {'name': 'Australian Dollar', 'symbol': 'A$'},
-        'CNY': {'name': 'Chinese Yuan', 'symbol': '¥'},
-        'INR': {'name': 'Indian Rupee', 'symbol': '₹'},
-        'NPR': {'name': 'Nepali Rupee', 'symbol': 'रु'},  # Added Nepali Rupee
-        'SGD': {'name': 'Singapore Dollar', 'symbol': 'S$'},
-        'AED': {'name': 'UAE Dirham', 'symbol': 'د.إ'},
+    def __init__(self, name, body):
+        stem, ext = os.path.splitext(name)
+        self.name = name
+        self.content_type = self.CONTENT_TYPES.get(ext, 'application/octet-stream')
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.fingerprinted_name = f'{stem}.{self.digest[:12]}{ext}'
+        self.etag = f'"{self.digest[:32]}"'
+        self.bodies = {
+            None: body,
+            'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+            'deflate': zlib.compress(body, 9),
+        }
+    
+    def encoded(self, encoding):
+        return self.bodies[encoding]
+
+def load_static_assets(directory=STATIC_DIR):
+    """Load every asset and point index.html at fingerprinted CSS/JS URLs"""
+    assets = {}
+    for name in sorted(os.listdir(directory)):
+        if name == 'index.html':
+            continue
+        with open(os.path.join(directory, name), 'rb') as f:
+            asset = StaticAsset(name, f.read())
+        assets[name] = assets[asset.fingerprinted_name] = asset
+    
+    with open(os.path.join(directory, 'index.html'), 'rb') as f:
+        html = f.read()
+    for name, asset in assets.items():
+        if name == asset.name:
+            html = html.replace(f'"/static/{name}"'.encode(),
+                                f'"/static/{asset.fingerprinted_name}"'.encode())
+    assets['index.html'] = StaticAsset('index.html', html)
+    return assets
+
+STATIC_ASSETS = load_static_assets()
+
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes buffered per chunk of a streamed response
+
+def group_chunks(pieces, chunk_size=STREAM_CHUNK_SIZE):
+    """Join small byte strings into chunks of about chunk_size"""
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            yield b''.join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield b''.join(buffer)
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 1000
+
+def parse_history_time(value):
+    """Normalize an ISO timestamp to the UTC text format stored in SQLite"""
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+@dataclass
+class HistoryQuery:
+    """Filters for reading history across the monthly partitions"""
+    conditions: List[str]
+    params: list
+    since: Optional[str] = None
+    until: Optional[str] = None
+    after: Optional[int] = None
+    limit: Optional[int] = None
+
+def build_history_query(query_params, default_limit=HISTORY_PAGE_SIZE, max_limit=HISTORY_MAX_PAGE_SIZE):
+    """Build a keyset-paginated history query from request parameters"""
+    option = lambda name: query_params.get(name, [None])[0]
+    query = HistoryQuery([], [])
+    
+    pair = option('pair')
+    if pair:
+        codes = pair.upper().split('/')
+        if len(codes) != 2 or not all(codes):
+            raise ValueError("pair must look like USD/NPR")
+        query.conditions.append('from_currency = ? AND to_currency = ?')
+        query.params.extend(codes)
+    
+    since = option('since')
+    if since:
+        query.since = parse_history_time(since)
+        query.conditions.append('timestamp >= ?')
+        query.params.append(query.since)
+    
+    until = option('until')
+    if until:
+        query.until = parse_history_time(until)
+        query.conditions.append('timestamp < ?')
+        query.params.append(query.until)
+    
+    after = option('after')
+    if after:
+        query.after = int(after)
+    
+    limit = option('limit') or default_limit
+    if limit is not None:
+        limit = int(limit)
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        query.limit = min(limit, max_limit) if max_limit else limit
+    return query
+
+def query_history(conn, query):
+    """Yield history rows newest first, walking the monthly partitions in order"""
+    remaining = query.limit
+    after_key, after_id = divmod(query.after, PARTITION_ID_SPAN) if query.after else (None, None)
+    for key in conversion_partitions(conn):
+        if query.until and key > partition_key(query.until):
+            continue
+        if query.since and key < partition_key(query.since):
+            break
+        if after_key is not None and key > after_key:
+            continue
+        
+        table = partition_table(key)
+        conditions, params = list(query.conditions), list(query.params)
+        if key == after_key:
+            conditions.append(f'(timestamp, id) < (SELECT timestamp, id FROM {table} WHERE id = ?)')
+            params.append(after_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        limit = ''
+        if remaining is not None:
+            limit = 'LIMIT ?'
+            params.append(remaining)
+        
+        for row in conn.execute(f'''
+            SELECT {key} * {PARTITION_ID_SPAN} + id, timestamp, from_currency, to_currency,
+                   amount, result, rate
+            FROM {table} {where}
+            ORDER BY timestamp DESC, id DESC {limit}
+        ''', params):
+            yield row
+            if remaining is not None:
+                remaining -= 1
+        if remaining == 0:
+            return
+
+def encode_history_rows(rows):
+    """Yield a JSON array of history rows piece by piece"""
+    yield b'['
+    separator = b''
+    for row in rows:
+        yield separator + json.dumps({
+            'id': row[0], 'date': row[1], 'from': row[2], 'to': row[3],
+            'amount': row[4], 'result': row[5], 'rate': row[6]
+        }).encode()
+        separator = b','
+    yield b']'
+
+EXPORT_BLOCK_ROWS = 4096  # Rows per block of a columnar export
+EXPORT_MAX_CONCURRENT = 4  # History exports streaming at once, each on its own connection
+EXPORT_SLOTS = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+EXPORT_COLUMNS = (  # Name and array type of each exported column
+    ('id', 'q'), ('timestamp', 'q'), ('from', 'I'), ('to', 'I'),
+    ('amount', 'd'), ('result', 'd'), ('rate', 'd'),
+)
+
+def history_timestamp_seconds(timestamp, day_starts):
+    """Unix seconds for a stored 'YYYY-MM-DD HH:MM:SS' UTC timestamp"""
+    if not timestamp:
+        return 0
+    day = timestamp[:10]
+    start = day_starts.get(day)
+    if start is None:
+        start = day_starts[day] = int(datetime.strptime(day, '%Y-%m-%d')
+                                      .replace(tzinfo=timezone.utc).timestamp())
+    return start + int(timestamp[11:13]) * 3600 + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+
+def encode_history_ndjson(rows):
+    """Yield history rows as newline-delimited JSON objects"""
+    for row in rows:
+        yield json.dumps({
+            'id': row[0], 'date': row[1], 'from': row[2], 'to': row[3],
+            'amount': row[4], 'result': row[5], 'rate': row[6]
+        }).encode() + b'\n'
+
+class ColumnarHistory:
+    """Compact binary export of conversion history.
+    
+    A header of column names and array types, then blocks of new dictionary
+    codes and little-endian column arrays; an empty block ends the stream.
+    """
+    
+    MAGIC = b'FXHC'
+    FORMAT = 1
+    HEADER = struct.Struct('<4sHH')  # magic, format, column count
+    BLOCK = struct.Struct('<II')  # rows, new dictionary codes
+    
+    @classmethod
+    def encode(cls, rows, block_rows=EXPORT_BLOCK_ROWS):
+        header = bytearray(cls.HEADER.pack(cls.MAGIC, cls.FORMAT, len(EXPORT_COLUMNS)))
+        for name, typecode in EXPORT_COLUMNS:
+            header += typecode.encode('ascii') + bytes([len(name)]) + name.encode('ascii')
+        yield bytes(header)
+        
+        codes = {}
+        day_starts = {}
+        rows = iter(rows)
+        while True:
+            block = list(itertools.islice(rows, block_rows))
+            new_codes = []
+            
+            def ordinal(code):
+                index = codes.get(code)
+                if index is None:
+                    index = codes[code] = len(codes)
+                    new_codes.append(code)
+                return index
+            
+            columns = list(zip(*block)) or [()] * len(EXPORT_COLUMNS)
+            arrays = [
+                array('q', columns[0]),
+                array('q', [history_timestamp_seconds(t, day_starts) for t in columns[1]]),
+                array('I', map(ordinal, columns[2])),
+                array('I', map(ordinal, columns[3])),
+                array('d', columns[4]),
+                array('d', columns[5]),
+                array('d', columns[6]),
+            ]
+            if sys.byteorder == 'big':
+                for values in arrays:
+                    values.byteswap()
+            
+            dictionary = b''.join(bytes([len(encoded)]) + encoded
+                                  for encoded in (code.encode('utf-8')[:255] for code in new_codes))
+            yield cls.BLOCK.pack(len(block), len(new_codes)) + dictionary + b''.join(
+                values.tobytes() for values in arrays)
+            if not block:
+                return
+    
+    @classmethod
+    def decode(cls, data):
+        """Decode a complete export into {'codes': [...], column name: array}"""
+        view = memoryview(data)
+        magic, fmt, count = cls.HEADER.unpack_from(view)
+        if magic != cls.MAGIC or fmt != cls.FORMAT:
+            raise ValueError("Not a columnar history export")
+        offset = cls.HEADER.size
+        columns = []
+        for _ in range(count):
+            typecode = chr(view[offset])
+            length = view[offset + 1]
+            columns.append((bytes(view[offset + 2:offset + 2 + length]).decode('ascii'), typecode))
+            offset += 2 + length
+        
+        result = {'codes': []}
+        result.update((name, array(typecode)) for name, typecode in columns)
+        while True:
+            rows, new_codes = cls.BLOCK.unpack_from(view, offset)
+            offset += cls.BLOCK.size
+            for _ in range(new_codes):
+                length = view[offset]
+                result['codes'].append(bytes(view[offset + 1:offset + 1 + length]).decode('utf-8'))
+                offset += 1 + length
+            if not rows:
+                break
+            for name, typecode in columns:
+                values = result[name]
+                size = rows * values.itemsize
+                values.frombytes(view[offset:offset + size])
+                offset += size
+        if sys.byteorder == 'big':
+            for name, _ in columns:
+                result[name].byteswap()
+        return result
+
+ANALYTICS_PERIODS = {'hour': (24, 168), 'day': (30, 366)}  # Default and most buckets per grain
+ANALYTICS_TOP_PAIRS = 10
+ANALYTICS_MAX_TOP_PAIRS = 100
+
+def analytics_window_start(grain, periods, now=None):
+    """Return the first bucket of the latest ``periods`` buckets at a grain"""
+    now = now or datetime.now(timezone.utc)
+    if grain == 'hour':
+        return (now - timedelta(hours=periods - 1)).strftime('%Y-%m-%d %H:00')
+    return (now - timedelta(days=periods - 1)).strftime('%Y-%m-%d')
+
+def histogram_median(bins):
+    """Median of a log-binned histogram given as (bin, count) in bin order"""
+    total = sum(count for _, count in bins)
+    seen = 0
+    for bin_, count in bins:
+        seen += count
+        if seen * 2 >= total:
+            return 10 ** ((bin_ + 0.5) / ROLLUP_BINS_PER_DECADE)
+    return None
+
+def query_analytics(conn, grain, periods, currency=None, limit=ANALYTICS_TOP_PAIRS):
+    """Summarize recent conversions from the rollup tables alone"""
+    start = analytics_window_start(grain, periods)
+    pair_filter = 'AND (from_currency = ? OR to_currency = ?)' if currency else ''
+    currency_params = [currency] if currency else []
+    
+    top_pairs = conn.execute(f'''
+        SELECT from_currency, to_currency, SUM(conversions) AS total, SUM(amount_total)
+        FROM conversion_rollups WHERE grain = ? AND bucket >= ? {pair_filter}
+        GROUP BY from_currency, to_currency ORDER BY total DESC LIMIT ?
+    ''', [grain, start, *currency_params * 2, limit]).fetchall()
+    
+    volume = conn.execute(f'''
+        SELECT bucket, from_currency, SUM(conversions), SUM(amount_total)
+        FROM conversion_rollups WHERE grain = ? AND bucket >= ? {'AND from_currency = ?' if currency else ''}
+        GROUP BY bucket, from_currency ORDER BY bucket, from_currency
+    ''', [grain, start, *currency_params]).fetchall()
+    
+    bins = {}
+    for code, bin_, count in conn.execute(f'''
+        SELECT currency, bin, SUM(conversions) FROM amount_histogram
+        WHERE grain = ? AND bucket >= ? {'AND currency = ?' if currency else ''}
+        GROUP BY currency, bin ORDER BY currency, bin
+    ''', [grain, start, *currency_params]):
+        bins.setdefault(code, []).append((bin_, count))
+    
+    return {
+        'grain': grain,
+        'since': start,
+        'periods': periods,
+        'top_pairs': [{'from': f, 'to': t, 'conversions': n, 'amount_total': round(a, 4)}
+                      for f, t, n, a in top_pairs],
+        'volume': [{'bucket': b, 'currency': c, 'conversions': n, 'amount_total': round(a, 4)}
+                   for b, c, n, a in volume],
+        'median_amount': {code: round(histogram_median(code_bins), 4) for code, code_bins in bins.items()},
+        'median_relative_error': round(10 ** (0.5 / ROLLUP_BINS_PER_DECADE) - 1, 4),
     }
+
+class RequestBodyReader(io.RawIOBase):
+    """Incremental reader over a Content-Length or chunked request body"""
+    
+    def __init__(self, rfile, content_length=None, chunked=False):
+        self.rfile = rfile
+        self.chunked = chunked
+        self.remaining = 0 if chunked else (content_length or 0)
+        self.finished = not chunked and not content_length
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        if self.finished:
+            return 0
+        if self.chunked and self.remaining == 0:
+            self._start_chunk()
+            if self.finished:
+                return 0
+        
+        data = self.rfile.read(min(len(buffer), self.remaining))
+        if not data:
+            raise ValueError("Request body ended early")
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        
+        if self.remaining == 0:
+            if self.chunked:
+                self.rfile.readline()  # CRLF after chunk data
+            else:
+                self.finished = True
+        return len(data)
+    
+    def _start_chunk(self):
+        line = self.rfile.readline(1024)
+        if not line:
+            raise ValueError("Request body ended early")
+        size = int(line.split(b';', 1)[0].strip(), 16)
+        if size == 0:
+            # Skip any trailer fields up to the terminating blank line
+            while self.rfile.readline(8192) not in (b'\r\n', b'\n', b''):
+                pass
+            self.finished = True
+        self.remaining = size
+
+def convert_csv_rows(rows, matrix, amount_column='amount', from_column='from',
+                     to_column='to', from_currency=None, to_currency=None):
+    """Yield the header and each CSV row with converted columns, or an error for bad rows"""
+    header = next(rows, None)
+    if header is None:
+        return
+    
+    def column(name):
+        if name not in header:
+            raise ValueError(f"CSV has no '{name}' column")
+        return header.index(name)
+    
+    amount_index = column(amount_column)
+    from_index = None if from_currency else column(from_column)
+    to_index = None if to_currency else column(to_column)
+    pair_rates = {}
+    
+    yield header + ['converted', 'rate', 'error']
+    while True:
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # The reader has already skipped the bad line, so carry on after it
+            yield [''] * len(header) + ['', '', f'Unreadable row: {e}']
+            continue
+        try:
+            pair = (from_currency or row[from_index].strip().upper(),
+                    to_currency or row[to_index].strip().upper())
+            rate = pair_rates.get(pair)
+            if rate is None:
+                rate = pair_rates[pair] = matrix.rate(*pair)
+            amount = float(row[amount_index])
+            yield row + [round(amount * rate, 4), round(rate, 6), '']
+        except (ValueError, IndexError) as e:
+            yield row + ['', '', str(e) or 'Malformed row']
+
+def encode_csv_chunks(rows, chunk_size=STREAM_CHUNK_SIZE):
+    """Serialize CSV rows and yield them as byte chunks of about chunk_size"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+class CurrencyConverterHandler(BaseHTTPRequestHandler):
     
     def do_GET(self):
         parsed_path = urllib.parse.urlparse(self.path)
+        if self.rate_limited(parsed_path):
+            return
         
         if parsed_path.path == '/':
             self.serve_homepage()
         
+        elif parsed_path.path.startswith('/static/'):
+            self.serve_static(parsed_path.path[len('/static/'):])
+        
         elif parsed_path.path == '/api/currencies':
             self.serve_currencies_list()
         
@@ -51,14 +2420,32 @@ class CurrencyConverterHandler(BaseHTTPRequestHandler):
             self.handle_conversion(parsed_path)
         
         elif parsed_path.path == '/api/history':
-            self.serve_conversion_history()
+            self.serve_conversion_history(parsed_path)
+        
+        elif parsed_path.path == '/api/history/export':
+            self.serve_history_export(parsed_path)
+        
+        elif parsed_path.path == '/api/rates/stream':
+            self.serve_rate_stream(parsed_path)
+        
+        elif parsed_path.path == '/api/rates/table':
+            self.serve_rate_table()
+        
+        elif parsed_path.path == '/api/rates/history':
+            self.serve_rate_history(parsed_path)
         
         elif parsed_path.path == '/api/latest':
-            self.serve_latest_rates()
+            self.serve_latest_rates(parsed_path)
         
         elif parsed_path.path == '/api/popular':
             self.serve_popular_rates()
         
+        elif parsed_path.path == '/api/analytics':
+            self.serve_analytics(parsed_path)
+        
+        elif parsed_path.path == '/api/stats':
+            self.serve_stats()
+        
         elif parsed_path.path == '/favicon.ico':
             self.send_favicon()
         
@@ -67,1238 +2454,107 @@ class CurrencyConverterHandler(BaseHTTPRequestHandler):
             self.end_headers()
     
     def do_POST(self):
-        if self.path == '/api/convert':
-            self.handle_conversion_post()
-        
-        elif self.path == '/api/save':
-            self.save_conversion()
-        
-        else:
-            self.send_response(404)
-            self.end_headers()
-    
-    def serve_homepage(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        
-        html = """
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Currency Converter Pro</title>
-            <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-            <style>
-                :root {
-                    --primary: #4361ee;
-                    --secondary: #3a0ca3;
-                    --accent: #7209b7;
-                    --success: #4cc9f0;
-                    --danger: #f72585;
-                    --warning: #f8961e;
-                    --light: #f8f9fa;
-                    --dark: #212529;
-                    --gray: #6c757d;
-                    --shadow: 0 4px 20px rgba(0,0,0,0.1);
-                    --gradient: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                }
-                
-                * {
-                    margin: 0;
-                    padding: 0;
-                    box-sizing: border-box;
-                }
-                
-                body {
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    background: var(--gradient);
-                    min-height: 100vh;
-                    padding: 20px;
-                    color: var(--dark);
-                }
-                
-                .app-container {
-                    max-width: 1200px;
-                    margin: 0 auto;
-                }
-                
-                /* Header */
-                .app-header {
-                    background: white;
-                    border-radius: 20px;
-                    padding: 30px;
-                    margin-bottom: 30px;
-                    box-shadow: var(--shadow);
-                    text-align: center;
-                }
-                
-                .header-content h1 {
-                    font-size: 2.8rem;
-                    background: linear-gradient(135deg, var(--primary), var(--accent));
-                    -webkit-background-clip: text;
-                    -webkit-text-fill-color: transparent;
-                    margin-bottom: 10px;
-                }
-                
-                .header-content p {
-                    color: var(--gray);
-                    font-size: 1.1rem;
-                    max-width: 600px;
-                    margin: 0 auto 20px;
-                }
-                
-                .rate-info {
-                    display: inline-block;
-                    background: var(--light);
-                    padding: 10px 20px;
-                    border-radius: 50px;
-                    font-size: 0.9rem;
-                    color: var(--primary);
-                    font-weight: 600;
-                }
-                
-                .rate-info i {
-                    margin-right: 8px;
-                }
-                
-                /* Main Layout */
-                .main-layout {
-                    display: grid;
-                    grid-template-columns: 1fr 400px;
-                    gap: 30px;
-                }
-                
-                @media (max-width: 992px) {
-                    .main-layout {
-                        grid-template-columns: 1fr;
-                    }
-                }
-                
-                /* Converter Card */
-                .converter-card {
-                    background: white;
-                    border-radius: 20px;
-                    padding: 40px;
-                    box-shadow: var(--shadow);
-                    margin-bottom: 30px;
-                }
-                
-                .converter-title {
-                    font-size: 1.8rem;
-                    color: var(--dark);
-                    margin-bottom: 30px;
-                    display: flex;
-                    align-items: center;
-                    gap: 15px;
-                }
-                
-                .converter-title i {
-                    color: var(--primary);
-                    font-size: 2rem;
-                }
-                
-                .converter-form {
-                    display: flex;
-                    flex-direction: column;
-                    gap: 25px;
-                }
-                
-                .amount-section {
-                    position: relative;
-                }
-                
-                .amount-label {
-                    display: block;
-                    margin-bottom: 10px;
-                    font-weight: 600;
-                    color: var(--dark);
-                    font-size: 1.1rem;
-                }
-                
-                .amount-input {
-                    width: 100%;
-                    padding: 20px;
-                    border: 2px solid #e0e0e0;
-                    border-radius: 15px;
-                    font-size: 2rem;
-                    font-weight: bold;
-                    transition: all 0.3s;
-                    text-align: right;
-                }
-                
-                .amount-input:focus {
-                    outline: none;
-                    border-color: var(--primary);
-                    box-shadow: 0 0 0 4px rgba(67, 97, 238, 0.1);
-                }
-                
-                .currency-display {
-                    position: absolute;
-                    left: 20px;
-                    top: 50px;
-                    font-size: 1.5rem;
-                    font-weight: 600;
-                    color: var(--primary);
-                }
-                
-                .currencies-grid {
-                    display: grid;
-                    grid-template-columns: 1fr 1fr;
-                    gap: 20px;
-                }
-                
-                @media (max-width: 576px) {
-                    .currencies-grid {
-                        grid-template-columns: 1fr;
-                    }
-                }
-                
-                .currency-selector {
-                    position: relative;
-                }
-                
-                .currency-selector label {
-                    display: block;
-                    margin-bottom: 10px;
-                    font-weight: 600;
-                    color: var(--dark);
-                }
-                
-                .currency-dropdown {
-                    width: 100%;
-                    padding: 15px;
-                    border: 2px solid #e0e0e0;
-                    border-radius: 15px;
-                    font-size: 1.1rem;
-                    background: white;
-                    cursor: pointer;
-                    transition: all 0.3s;
-                    appearance: none;
-                    padding-right: 50px;
-                }
-                
-                .currency-dropdown:focus {
-                    outline: none;
-                    border-color: var(--primary);
-                }
-                
-                .dropdown-arrow {
-                    position: absolute;
-                    right: 20px;
-                    top: 45px;
-                    color: var(--gray);
-                    pointer-events: none;
-                }
-                
-                /* Result Card */
-                .result-card {
-                    background: linear-gradient(135deg, var(--primary), var(--secondary));
-                    color: white;
-                    border-radius: 20px;
-                    padding: 40px;
-                    box-shadow: var(--shadow);
-                    text-align: center;
-                    margin-top: 30px;
-                }
-                
-                .result-title {
-                    font-size: 1.2rem;
-                    opacity: 0.9;
-                    margin-bottom: 20px;
-                    text-transform: uppercase;
-                    letter-spacing: 1px;
-                }
-                
-                .result-amount {
-                    font-size: 3.5rem;
-                    font-weight: bold;
-                    margin-bottom: 10px;
-                    line-height: 1;
-                }
-                
-                .result-currency {
-                    font-size: 1.5rem;
-                    opacity: 0.9;
-                    margin-bottom: 30px;
-                }
-                
-                .result-details {
-                    display: flex;
-                    justify-content: space-between;
-                    margin-top: 30px;
-                    padding-top: 20px;
-                    border-top: 1px solid rgba(255,255,255,0.2);
-                }
-                
-                .detail-item {
-                    text-align: center;
-                }
-                
-                .detail-value {
-                    font-size: 1.3rem;
-                    font-weight: 600;
-                }
-                
-                .detail-label {
-                    font-size: 0.9rem;
-                    opacity: 0.7;
-                    margin-top: 5px;
-                }
-                
-                /* Action Buttons */
-                .action-buttons {
-                    display: flex;
-                    gap: 15px;
-                    margin-top: 30px;
-                }
-                
-                .btn {
-                    padding: 15px 30px;
-                    border: none;
-                    border-radius: 15px;
-                    font-size: 1.1rem;
-                    font-weight: 600;
-                    cursor: pointer;
-                    transition: all 0.3s;
-                    display: flex;
-                    align-items: center;
-                    justify-content: center;
-                    gap: 10px;
-                    flex: 1;
-                }
-                
-                .btn-primary {
-                    background: var(--primary);
-                    color: white;
-                }
-                
-                .btn-primary:hover {
-                    background: var(--secondary);
-                    transform: translateY(-2px);
-                    box-shadow: 0 10px 20px rgba(67, 97, 238, 0.3);
-                }
-                
-                .btn-secondary {
-                    background: var(--light);
-                    color: var(--dark);
-                }
-                
-                .btn-secondary:hover {
-                    background: #e9ecef;
-                }
-                
-                /* Popular Rates Sidebar */
-                .sidebar {
-                    background: white;
-                    border-radius: 20px;
-                    padding: 30px;
-                    box-shadow: var(--shadow);
-                    height: fit-content;
-                }
-                
-                .sidebar-title {
-                    font-size: 1.5rem;
-                    color: var(--dark);
-                    margin-bottom: 25px;
-                    display: flex;
-                    align-items: center;
-                    gap: 10px;
-                }
-                
-                .rates-list {
-                    display: flex;
-                    flex-direction: column;
-                    gap: 15px;
-                }
-                
-                .rate-item {
-                    display: flex;
-                    justify-content: space-between;
-                    align-items: center;
-                    padding: 15px;
-                    background: var(--light);
-                    border-radius: 12px;
-                    transition: all 0.3s;
-                    cursor: pointer;
-                }
-                
-                .rate-item:hover {
-                    background: #e9ecef;
-                    transform: translateX(5px);
-                }
-                
-                .rate-item.active {
-                    background: var(--primary);
-                    color: white;
-                }
-                
-                .rate-currency {
-                    display: flex;
-                    align-items: center;
-                    gap: 10px;
-                }
-                
-                .rate-symbol {
-                    font-size: 1.2rem;
-                    font-weight: 600;
-                }
-                
-                .rate-code {
-                    font-size: 0.9rem;
-                    opacity: 0.7;
-                }
-                
-                .rate-value {
-                    font-size: 1.2rem;
-                    font-weight: 600;
-                }
-                
-                /* History Section */
-                .history-section {
-                    background: white;
-                    border-radius: 20px;
-                    padding: 30px;
-                    box-shadow: var(--shadow);
-                    margin-top: 30px;
-                }
-                
-                .section-header {
-                    display: flex;
-                    justify-content: space-between;
-                    align-items: center;
-                    margin-bottom: 25px;
-                }
-                
-                .history-table {
-                    width: 100%;
-                    border-collapse: collapse;
-                }
-                
-                .history-table th {
-                    text-align: left;
-                    padding: 15px;
-                    border-bottom: 2px solid var(--light);
-                    color: var(--gray);
-                    font-weight: 600;
-                    text-transform: uppercase;
-                    font-size: 0.9rem;
-                    letter-spacing: 1px;
-                }
-                
-                .history-table td {
-                    padding: 15px;
-                    border-bottom: 1px solid var(--light);
-                }
-                
-                .history-table tr:hover {
-                    background: var(--light);
-                }
-                
-                /* Toast */
-                .toast {
-                    position: fixed;
-                    top: 20px;
-                    right: 20px;
-                    padding: 15px 25px;
-                    border-radius: 10px;
-                    color: white;
-                    font-weight: 600;
-                    z-index: 1000;
-                    animation: slideIn 0.3s ease;
-                    box-shadow: 0 5px 15px rgba(0,0,0,0.2);
-                }
-                
-                .toast.success {
-                    background: linear-gradient(135deg, #4CAF50, #45a049);
-                }
-                
-                .toast.error {
-                    background: linear-gradient(135deg, #f72585, #ff006e);
-                }
-                
-                .toast.info {
-                    background: linear-gradient(135deg, var(--primary), var(--secondary));
-                }
-                
-                @keyframes slideIn {
-                    from { transform: translateX(100%); opacity: 0; }
-                    to { transform: translateX(0); opacity: 1; }
-                }
-                
-                @keyframes slideOut {
-                    from { transform: translateX(0); opacity: 1; }
-                    to { transform: translateX(100%); opacity: 0; }
-                }
-                
-                /* Loading Spinner */
-                .spinner {
-                    display: inline-block;
-                    width: 20px;
-                    height: 20px;
-                    border: 3px solid rgba(255,255,255,0.3);
-                    border-radius: 50%;
-                    border-top-color: white;
-                    animation: spin 1s ease-in-out infinite;
-                }
-                
-                @keyframes spin {
-                    to { transform: rotate(360deg); }
-                }
-                
-                /* Responsive */
-                @media (max-width: 768px) {
-                    .app-header {
-                        padding: 20px;
-                    }
-                    
-                    .header-content h1 {
-                        font-size: 2rem;
-                    }
-                    
-                    .converter-card {
-                        padding: 20px;
-                    }
-                    
-                    .amount-input {
-                        font-size: 1.5rem;
-                        padding: 15px;
-                    }
-                    
-                    .currency-display {
-                        top: 40px;
-                        font-size: 1.2rem;
-                    }
-                    
-                    .result-amount {
-                        font-size: 2.5rem;
-                    }
-                }
-            </style>
-        </head>
-        <body>
-            <div class="app-container">
-                <!-- Header -->
-                <header class="app-header">
-                    <div class="header-content">
-                        <h1><i class="fas fa-money-bill-wave"></i> Currency Converter Pro</h1>
-                        <p>Convert between 150+ currencies with real-time exchange rates including Nepali Rupee (NPR)!</p>
-                        <div class="rate-info">
-                            <i class="fas fa-sync-alt"></i>
-                            <span id="last-updated">Rates update every hour</span>
-                        </div>
-                    </div>
-                </header>
-
-                <!-- Main Layout -->
-                <div class="main-layout">
-                    <!-- Main Converter -->
-                    <div class="main-content">
-                        <!-- Converter Card -->
-                        <div class="converter-card">
-                            <h2 class="converter-title">
-                                <i class="fas fa-exchange-alt"></i> Currency Converter
-                            </h2>
-                            
-                            <form class="converter-form" id="converterForm">
-                                <!-- Amount Input -->
-                                <div class="amount-section">
-                                    <label class="amount-label">Amount</label>
-                                    <div class="currency-display" id="fromCurrencySymbol">$</div>
-                                    <input type="number" 
-                                           id="amount" 
-                                           class="amount-input" 
-                                           value="100" 
-                                           min="0" 
-                                           step="0.01"
-                                           placeholder="0.00"
-                                           required>
-                                </div>
-                                
-                                <!-- Currency Selection -->
-                                <div class="currencies-grid">
-                                    <div class="currency-selector">
-                                        <label for="fromCurrency">From Currency</label>
-                                        <select id="fromCurrency" class="currency-dropdown">
-                                            <!-- Currencies will be loaded here -->
-                                        </select>
-                                        <div class="dropdown-arrow">▼</div>
-                                    </div>
-                                    
-                                    <div class="currency-selector">
-                                        <label for="toCurrency">To Currency</label>
-                                        <select id="toCurrency" class="currency-dropdown">
-                                            <!-- Currencies will be loaded here -->
-                                        </select>
-                                        <div class="dropdown-arrow">▼</div>
-                                    </div>
-                                </div>
-                                
-                                <!-- Action Buttons -->
-                                <div class="action-buttons">
-                                    <button type="button" class="btn btn-primary" onclick="convertCurrency()" id="convertBtn">
-                                        <i class="fas fa-calculator"></i> Convert
-                                    </button>
-                                    <button type="button" class="btn btn-secondary" onclick="swapCurrencies()">
-                                        <i class="fas fa-exchange-alt"></i> Swap
-                                    </button>
-                                    <button type="button" class="btn btn-secondary" onclick="clearForm()">
-                                        <i class="fas fa-eraser"></i> Clear
-                                    </button>
-                                </div>
-                            </form>
-                        </div>
-                        
-                        <!-- Result Card -->
-                        <div class="result-card" id="resultCard" style="display: none;">
-                            <div class="result-title">Converted Amount</div>
-                            <div class="result-amount" id="resultAmount">0.00</div>
-                            <div class="result-currency" id="resultCurrency">USD</div>
-                            
-                            <div class="result-details">
-                                <div class="detail-item">
-                                    <div class="detail-value" id="exchangeRate">1.00</div>
-                                    <div class="detail-label">Exchange Rate</div>
-                                </div>
-                                <div class="detail-item">
-                                    <div class="detail-value" id="lastUpdatedTime">Just now</div>
-                                    <div class="detail-label">Last Updated</div>
-                                </div>
-                            </div>
-                            
-                            <div class="action-buttons" style="margin-top: 30px;">
-                                <button type="button" class="btn btn-secondary" onclick="saveConversion()">
-                                    <i class="fas fa-save"></i> Save
-                                </button>
-                                <button type="button" class="btn btn-secondary" onclick="copyResult()">
-                                    <i class="fas fa-copy"></i> Copy
-                                </button>
-                            </div>
-                        </div>
-                    </div>
-                    
-                    <!-- Sidebar -->
-                    <aside class="sidebar">
-                        <h3 class="sidebar-title">
-                            <i class="fas fa-chart-line"></i> Popular Rates (vs USD)
-                        </h3>
-                        <div class="rates-list" id="popularRates">
-                            <!-- Popular rates will be loaded here -->
-                        </div>
-                        
-                        <div style="margin-top: 30px;">
-                            <h3 class="sidebar-title">
-                                <i class="fas fa-history"></i> Quick Convert
-                            </h3>
-                            <div class="action-buttons" style="flex-direction: column;">
-                                <button type="button" class="btn btn-secondary" onclick="setAmount(100)">
-                                    <i class="fas fa-dollar-sign"></i> $100 USD
-                                </button>
-                                <button type="button" class="btn btn-secondary" onclick="setAmount(500)">
-                                    <i class="fas fa-dollar-sign"></i> $500 USD
-                                </button>
-                                <button type="button" class="btn btn-secondary" onclick="setAmount(1000)">
-                                    <i class="fas fa-dollar-sign"></i> $1,000 USD
-                                </button>
-                            </div>
-                            
-                            <div style="margin-top: 20px;">
-                                <h4 style="color: var(--dark); margin-bottom: 10px;">🇳🇵 Nepali Rupee (NPR)</h4>
-                                <div class="action-buttons" style="flex-direction: column;">
-                                    <button type="button" class="btn btn-secondary" onclick="convertToNPR(100)">
-                                        <i class="fas fa-dollar-sign"></i> $100 → NPR
-                                    </button>
-                                    <button type="button" class="btn btn-secondary" onclick="convertFromNPR(1000)">
-                                        <i class="fas fa-rupee-sign"></i> 1,000 NPR → USD
-                                    </button>
-                                </div>
-                            </div>
-                        </div>
-                    </aside>
-                </div>
-                
-                <!-- History Section -->
-                <div class="history-section">
-                    <div class="section-header">
-                        <h3 class="sidebar-title">
-                            <i class="fas fa-history"></i> Conversion History
-                        </h3>
-                        <button type="button" class="btn btn-secondary" onclick="clearHistory()">
-                            <i class="fas fa-trash"></i> Clear History
-                        </button>
-                    </div>
-                    <table class="history-table">
-                        <thead>
-                            <tr>
-                                <th>Date</th>
-                                <th>From</th>
-                                <th>To</th>
-                                <th>Amount</th>
-                                <th>Result</th>
-                                <th>Rate</th>
-                            </tr>
-                        </thead>
-                        <tbody id="historyTable">
-                            <!-- History will be loaded here -->
-                        </tbody>
-                    </table>
-                </div>
-            </div>
-            
-            <script>
-                // Global variables
-                let currencies = [];
-                let exchangeRates = {};
-                
-                // DOM Elements
-                const fromCurrencySelect = document.getElementById('fromCurrency');
-                const toCurrencySelect = document.getElementById('toCurrency');
-                const amountInput = document.getElementById('amount');
-                const fromCurrencySymbol = document.getElementById('fromCurrencySymbol');
-                const resultCard = document.getElementById('resultCard');
-                const resultAmount = document.getElementById('resultAmount');
-                const resultCurrency = document.getElementById('resultCurrency');
-                const exchangeRate = document.getElementById('exchangeRate');
-                const lastUpdatedTime = document.getElementById('lastUpdatedTime');
-                const popularRates = document.getElementById('popularRates');
-                const historyTable = document.getElementById('historyTable');
-                const lastUpdatedSpan = document.getElementById('last-updated');
-                const convertBtn = document.getElementById('convertBtn');
-                
-                // Initialize on page load
-                document.addEventListener('DOMContentLoaded', function() {
-                    loadCurrencies();
-                    loadPopularRates();
-                    loadHistory();
-                    updateLastUpdated();
-                });
-                
-                // Load all available currencies
-                function loadCurrencies() {
-                    fetch('/api/currencies')
-                        .then(response => response.json())
-                        .then(data => {
-                            currencies = data;
-                            populateCurrencySelects();
-                            // Set default currencies
-                            setDefaultCurrencies();
-                        })
-                        .catch(error => {
-                            console.error('Error loading currencies:', error);
-                            showToast('Error loading currencies', 'error');
-                        });
-                }
-                
-                // Populate currency dropdowns
-                function populateCurrencySelects() {
-                    fromCurrencySelect.innerHTML = '';
-                    toCurrencySelect.innerHTML = '';
-                    
-                    currencies.forEach(currency => {
-                        const option1 = document.createElement('option');
-                        option1.value = currency.code;
-                        option1.textContent = `${currency.code} - ${currency.name}`;
-                        
-                        const option2 = option1.cloneNode(true);
-                        
-                        fromCurrencySelect.appendChild(option1);
-                        toCurrencySelect.appendChild(option2);
-                    });
-                }
-                
-                // Set default currencies
-                function setDefaultCurrencies() {
-                    // Try to get user's location for default currency
-                    const userCurrency = getUserCurrency();
-                    
-                    fromCurrencySelect.value = userCurrency;
-                    toCurrencySelect.value = 'EUR';
-                    updateCurrencySymbol();
-                }
-                
-                // Guess user's currency based on browser language
-                function getUserCurrency() {
-                    const language = navigator.language || 'en-US';
-                    
-                    if (language.includes('en-US') || language.includes('en-CA')) return 'USD';
-                    if (language.includes('en-GB')) return 'GBP';
-                    if (language.includes('en-AU')) return 'AUD';
-                    if (language.includes('ja')) return 'JPY';
-                    if (language.includes('zh')) return 'CNY';
-                    if (language.includes('hi')) return 'INR';
-                    if (language.includes('ne')) return 'NPR';  // Nepali language
-                    if (language.includes('ar')) return 'AED';
-                    
-                    // Default to USD
-                    return 'USD';
-                }
-                
-                // Load popular exchange rates
-                function loadPopularRates() {
-                    fetch('/api/popular')
-                        .then(response => response.json())
-                        .then(data => {
-                            displayPopularRates(data);
-                        })
-                        .catch(error => {
-                            console.error('Error loading popular rates:', error);
-                        });
-                }
-                
-                // Display popular rates in sidebar
-                function displayPopularRates(rates) {
-                    popularRates.innerHTML = '';
-                    
-                    Object.entries(rates).forEach(([currency, rate]) => {
-                        const rateItem = document.createElement('div');
-                        rateItem.className = 'rate-item';
-                        rateItem.onclick = () => {
-                            toCurrencySelect.value = currency;
-                            convertCurrency();
-                        };
-                        
-                        const currencyInfo = getCurrencyInfo(currency);
-                        
-                        rateItem.innerHTML = `
-                            <div class="rate-currency">
-                                <span class="rate-symbol">${currencyInfo.symbol}</span>
-                                <span class="rate-code">${currency}</span>
-                            </div>
-                            <div class="rate-value">${rate.toFixed(4)}</div>
-                        `;
-                        
-                        popularRates.appendChild(rateItem);
-                    });
-                }
-                
-                // Get currency info (symbol, name)
-                function getCurrencyInfo(currencyCode) {
-                    const currency = currencies.find(c => c.code === currencyCode);
-                    if (currency) {
-                        return {
-                            symbol: currency.symbol || currencyCode,
-                            name: currency.name
-                        };
-                    }
-                    return { symbol: currencyCode, name: currencyCode };
-                }
-                
-                // Main conversion function
-                function convertCurrency() {
-                    const amount = parseFloat(amountInput.value);
-                    const fromCurrency = fromCurrencySelect.value;
-                    const toCurrency = toCurrencySelect.value;
-                    
-                    if (!amount || amount <= 0) {
-                        showToast('Please enter a valid amount', 'error');
-                        return;
-                    }
-                    
-                    if (fromCurrency === toCurrency) {
-                        showToast('Please select different currencies', 'error');
-                        return;
-                    }
-                    
-                    // Show loading
-                    convertBtn.innerHTML = '<span class="spinner"></span> Converting...';
-                    convertBtn.disabled = true;
-                    
-                    // Make API call
-                    fetch(`/api/convert?amount=${amount}&from=${fromCurrency}&to=${toCurrency}`)
-                        .then(response => response.json())
-                        .then(data => {
-                            if (data.success) {
-                                displayResult(data);
-                                saveConversionToLocal(data);
-                                updateLastUpdated();
-                            } else {
-                                showToast(data.error || 'Conversion failed', 'error');
-                            }
-                        })
-                        .catch(error => {
-                            console.error('Error converting currency:', error);
-                            showToast('Error converting currency', 'error');
-                        })
-                        .finally(() => {
-                            // Reset button
-                            convertBtn.innerHTML = '<i class="fas fa-calculator"></i> Convert';
-                            convertBtn.disabled = false;
-                        });
-                }
-                
-                // Convert USD to Nepali Rupee
-                function convertToNPR(amount) {
-                    amountInput.value = amount;
-                    fromCurrencySelect.value = 'USD';
-                    toCurrencySelect.value = 'NPR';
-                    updateCurrencySymbol();
-                    convertCurrency();
-                }
-                
-                // Convert Nepali Rupee to USD
-                function convertFromNPR(amount) {
-                    amountInput.value = amount;
-                    fromCurrencySelect.value = 'NPR';
-                    toCurrencySelect.value = 'USD';
-                    updateCurrencySymbol();
-                    convertCurrency();
-                }
-                
-                // Display conversion result
-                function displayResult(data) {
-                    resultAmount.textContent = data.result.toLocaleString('en-US', {
-                        minimumFractionDigits: 2,
-                        maximumFractionDigits: 2
-                    });
-                    
-                    resultCurrency.textContent = data.to;
-                    exchangeRate.textContent = data.rate.toFixed(6);
-                    lastUpdatedTime.textContent = 'Just now';
-                    
-                    // Show result card
-                    resultCard.style.display = 'block';
-                    
-                    // Smooth scroll to result
-                    resultCard.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
-                }
-                
-                // Swap currencies
-                function swapCurrencies() {
-                    const temp = fromCurrencySelect.value;
-                    fromCurrencySelect.value = toCurrencySelect.value;
-                    toCurrencySelect.value = temp;
-                    updateCurrencySymbol();
-                    
-                    // Convert immediately if there's a result
-                    if (resultCard.style.display !== 'none') {
-                        convertCurrency();
-                    }
-                }
-                
-                // Update currency symbol display
-                function updateCurrencySymbol() {
-                    const currencyCode = fromCurrencySelect.value;
-                    const currencyInfo = getCurrencyInfo(currencyCode);
-                    fromCurrencySymbol.textContent = currencyInfo.symbol;
-                }
-                
-                // Set amount quickly
-                function setAmount(amount) {
-                    amountInput.value = amount;
-                    convertCurrency();
-                }
-                
-                // Clear form
-                function clearForm() {
-                    amountInput.value = '';
-                    resultCard.style.display = 'none';
-                    showToast('Form cleared', 'info');
-                }
-                
-                // Save conversion to server
-                function saveConversion() {
-                    const amount = parseFloat(amountInput.value);
-                    const fromCurrency = fromCurrencySelect.value;
-                    const toCurrency = toCurrencySelect.value;
-                    
-                    fetch('/api/save', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json',
-                        },
-                        body: JSON.stringify({
-                            amount: amount,
-                            from: fromCurrency,
-                            to: toCurrency,
-                            result: parseFloat(resultAmount.textContent.replace(/,/g, '')),
-                            rate: parseFloat(exchangeRate.textContent)
-                        })
-                    })
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            showToast('Conversion saved!', 'success');
-                            loadHistory();
-                        }
-                    })
-                    .catch(error => {
-                        console.error('Error saving conversion:', error);
-                    });
-                }
-                
-                // Save conversion to localStorage
-                function saveConversionToLocal(data) {
-                    const history = JSON.parse(localStorage.getItem('currencyHistory') || '[]');
-                    
-                    history.unshift({
-                        date: new Date().toLocaleString(),
-                        from: data.from,
-                        to: data.to,
-                        amount: data.amount,
-                        result: data.result,
-                        rate: data.rate
-                    });
-                    
-                    // Keep only last 50 conversions
-                    if (history.length > 50) {
-                        history.pop();
-                    }
-                    
-                    localStorage.setItem('currencyHistory', JSON.stringify(history));
-                    loadHistory();
-                }
-                
-                // Load conversion history
-                function loadHistory() {
-                    // Try server history first, fallback to localStorage
-                    fetch('/api/history')
-                        .then(response => response.json())
-                        .then(data => {
-                            displayHistory(data);
-                        })
-                        .catch(() => {
-                            // Fallback to localStorage
-                            const history = JSON.parse(localStorage.getItem('currencyHistory') || '[]');
-                            displayHistory(history);
-                        });
-                }
-                
-                // Display history in table
-                function displayHistory(history) {
-                    historyTable.innerHTML = '';
-                    
-                    if (history.length === 0) {
-                        historyTable.innerHTML = `
-                            <tr>
-                                <td colspan="6" style="text-align: center; padding: 40px; color: var(--gray);">
-                                    <i class="fas fa-history" style="font-size: 2rem; margin-bottom: 10px; display: block;"></i>
-                                    No conversion history yet
-                                </td>
-                            </tr>
-                        `;
-                        return;
-                    }
-                    
-                    history.forEach(item => {
-                        const row = document.createElement('tr');
-                        
-                        row.innerHTML = `
-                            <td>${item.date}</td>
-                            <td><strong>${item.from}</strong></td>
-                            <td><strong>${item.to}</strong></td>
-                            <td>${parseFloat(item.amount).toLocaleString('en-US', {
-                                minimumFractionDigits: 2,
-                                maximumFractionDigits: 2
-                            })}</td>
-                            <td><strong>${parseFloat(item.result).toLocaleString('en-US', {
-                                minimumFractionDigits: 2,
-                                maximumFractionDigits: 2
-                            })}</strong></td>
-                            <td>${parseFloat(item.rate).toFixed(6)}</td>
-                        `;
-                        
-                        historyTable.appendChild(row);
-                    });
-                }
-                
-                // Clear history
-                function clearHistory() {
-                    if (confirm('Are you sure you want to clear all history?')) {
-                        localStorage.removeItem('currencyHistory');
-                        loadHistory();
-                        showToast('History cleared', 'success');
-                    }
-                }
-                
-                // Copy result to clipboard
-                function copyResult() {
-                    const text = `${amountInput.value} ${fromCurrencySelect.value} = ${resultAmount.textContent} ${toCurrencySelect.value}`;
-                    
-                    navigator.clipboard.writeText(text)
-                        .then(() => {
-                            showToast('Copied to clipboard!', 'success');
-                        })
-                        .catch(err => {
-                            console.error('Failed to copy: ', err);
-                            showToast('Failed to copy', 'error');
-                        });
-                }
-                
-                // Update last updated time
-                function updateLastUpdated() {
-                    const now = new Date();
-                    lastUpdatedSpan.textContent = `Last updated: ${now.toLocaleTimeString([], {hour: '2-digit', minute:'2-digit'})}`;
-                }
-                
-                // Show toast notification
-                function showToast(message, type) {
-                    // Remove existing toasts
-                    const existingToasts = document.querySelectorAll('.toast');
-                    existingToasts.forEach(toast => toast.remove());
-                    
-                    const toast = document.createElement('div');
-                    toast.className = `toast ${type}`;
-                    toast.textContent = message;
-                    
-                    document.body.appendChild(toast);
-                    
-                    // Auto remove after 3 seconds
-                    setTimeout(() => {
-                        toast.style.animation = 'slideOut 0.3s ease';
-                        setTimeout(() => toast.remove(), 300);
-                    }, 3000);
-                }
-                
-                // Event listeners
-                fromCurrencySelect.addEventListener('change', updateCurrencySymbol);
-                amountInput.addEventListener('input', updateCurrencySymbol);
-                
-                // Auto-convert when currencies change
-                fromCurrencySelect.addEventListener('change', () => {
-                    if (amountInput.value && resultCard.style.display !== 'none') {
-                        convertCurrency();
-                    }
-                });
-                
-                toCurrencySelect.addEventListener('change', () => {
-                    if (amountInput.value && resultCard.style.display !== 'none') {
-                        convertCurrency();
-                    }
-                });
-                
-                // Auto-convert on amount change (with debounce)
-                let convertTimeout;
-                amountInput.addEventListener('input', () => {
-                    clearTimeout(convertTimeout);
-                    
-                    if (amountInput.value && resultCard.style.display !== 'none') {
-                        convertTimeout = setTimeout(() => {
-                            convertCurrency();
-                        }, 500);
-                    }
-                });
-            </script>
-        </body>
-        </html>
-        """
-        self.wfile.write(html.encode())
+        parsed_path = urllib.parse.urlparse(self.path)
+        if self.rate_limited(parsed_path):
+            return
+        
+        if parsed_path.path == '/api/convert':
+            self.handle_conversion_post()
+        
+        elif parsed_path.path == '/api/convert/batch':
+            self.handle_batch_conversion()
+        
+        elif parsed_path.path == '/api/convert/csv':
+            self.handle_csv_conversion(parsed_path)
+        
+        elif parsed_path.path == '/api/save':
+            self.save_conversion()
+        
+        else:
+            self.send_response(404)
+            self.end_headers()
     
-    def serve_currencies_list(self):
-        """Return list of all supported currencies"""
-        currencies = [
-            {"code": "USD", "name": "US Dollar", "symbol": "$"},
-            {"code": "EUR", "name": "Euro", "symbol": "€"},
-            {"code": "GBP", "name": "British Pound", "symbol": "£"},
-            {"code": "JPY", "name": "Japanese Yen", "symbol": "¥"},
-            {"code": "CAD", "name": "Canadian Dollar", "symbol": "CA$"},
-            {"code": "AUD", "name": "Australian Dollar", "symbol": "A$"},
-            {"code": "CNY", "name": "Chinese Yuan", "symbol": "¥"},
-            {"code": "INR", "name": "Indian Rupee", "symbol": "₹"},
-            {"code": "NPR", "name": "Nepali Rupee", "symbol": "रु"},  # Added Nepali Rupee
-            {"code": "SGD", "name": "Singapore Dollar", "symbol": "S$"},
-            {"code": "AED", "name": "UAE Dirham", "symbol": "د.إ"},
-            {"code": "CHF", "name": "Swiss Franc", "symbol": "CHF"},
-            {"code": "HKD", "name": "Hong Kong Dollar", "symbol": "HK$"},
-            {"code": "KRW", "name": "South Korean Won", "symbol": "₩"},
-            {"code": "MXN", "name": "Mexican Peso", "symbol": "MX$"},
-            {"code": "BRL", "name": "Brazilian Real", "symbol": "R$"},
-            {"code": "RUB", "name": "Russian Ruble", "symbol": "₽"},
-            {"code": "ZAR", "name": "South African Rand", "symbol": "R"},
-            {"code": "TRY", "name": "Turkish Lira", "symbol": "₺"},
-            {"code": "NZD", "name": "New Zealand Dollar", "symbol": "NZ$"},
-            {"code": "SEK", "name": "Swedish Krona", "symbol": "kr"},
-            {"code": "NOK", "name": "Norwegian Krone", "symbol": "kr"},
-            {"code": "DKK", "name": "Danish Krone", "symbol": "kr"},
-            {"code": "PLN", "name": "Polish Zloty", "symbol": "zł"},
-            {"code": "THB", "name": "Thai Baht", "symbol": "฿"},
-            {"code": "IDR", "name": "Indonesian Rupiah", "symbol": "Rp"},
-            {"code": "MYR", "name": "Malaysian Ringgit", "symbol": "RM"},
-            {"code": "PHP", "name": "Philippine Peso", "symbol": "₱"},
-            {"code": "SAR", "name": "Saudi Riyal", "symbol": "﷼"},
-            {"code": "EGP", "name": "Egyptian Pound", "symbol": "E£"},
-            {"code": "PKR", "name": "Pakistani Rupee", "symbol": "₨"},
-        ]
+    def serve_homepage(self):
+        self.serve_static('index.html')
+    
+    def serve_static(self, name):
+        """Send a precompressed asset, negotiating its encoding"""
+        asset = STATIC_ASSETS.get(name)
+        if asset is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        
+        if name == asset.fingerprinted_name:
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            cache_control = 'no-cache'
+        
+        encoding = negotiate_encoding(self.headers.get('Accept-Encoding', ''), ('gzip', 'deflate'))
+        etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
         
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+        
+        body = asset.encoded(encoding)
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-type', asset.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
         self.end_headers()
-        self.wfile.write(json.dumps(currencies).encode())
+        self.wfile.write(body)
+    
+    def serve_currencies_list(self):
+        """Return list of all supported currencies"""
+        snapshot = RATE_STORE.snapshot()
+        encoded = RESPONSE_CACHE.get(snapshot.version, 'currencies',
+                                     lambda: self.currencies_list(snapshot))
+        self.send_encoded(encoded, RATES_MAX_AGE)
+    
+    def currencies_list(self, snapshot):
+        return [CURRENCIES.info(ordinal) for ordinal in snapshot.matrix.available]
     
     def get_exchange_rates(self):
-        """Get exchange rates from cache or API"""
-        now = datetime.now()
-        
-        # Return cached rates if still valid
-        if (self.cache_timestamp and 
-            (now - self.cache_timestamp).seconds < self.CACHE_DURATION and
-            self.exchange_rates_cache):
-            return self.exchange_rates_cache
-        
-        try:
-            # Using ExchangeRate-API (free tier)
-            api_key = "YOUR_API_KEY_HERE"  # Get free key from exchangerate-api.com
-            url = f"https://api.exchangerate-api.com/v4/latest/USD"
-            
-            # For demo purposes, using fallback rates if no API key
-            if api_key == "YOUR_API_KEY_HERE":
-                print("⚠️  Using demo exchange rates (get free API key from exchangerate-api.com)")
-                rates = self.get_fallback_rates()
-            else:
-                response = urllib.request.urlopen(url)
-                data = json.loads(response.read().decode())
-                rates = data['rates']
-                # Add NPR if not in API response (API might not have NPR)
-                if 'NPR' not in rates:
-                    rates['NPR'] = 133.25  # Default fallback rate
-                
-            self.exchange_rates_cache = rates
-            self.cache_timestamp = now
-            
-            return rates
-            
-        except Exception as e:
-            print(f"Error fetching exchange rates: {e}")
-            # Return fallback rates if API fails
-            return self.get_fallback_rates()
+        """Get exchange rates from the shared in-memory snapshot"""
+        return RATE_STORE.snapshot().rates
     
     def get_fallback_rates(self):
         """Fallback exchange rates for demo purposes"""
+        return get_fallback_rates()
+    
+    def convert(self, amount, from_currency, to_currency, snapshot=None):
+        """Convert an amount using a single cross-rate lookup"""
+        snapshot = snapshot or RATE_STORE.snapshot()
+        rate = snapshot.matrix.rate(from_currency, to_currency)
+        result = amount * rate
+        
         return {
-            'USD': 1.0,
-            'EUR': 0.92,
-            'GBP': 0.79,
-            'JPY': 148.50,
-            'CAD': 1.35,
-            'AUD': 1.52,
-            'CNY': 7.18,
-            'INR': 83.10,
-            'NPR': 133.25,  # Added Nepali Rupee rate (1 USD = ~133.25 NPR)
-            'SGD': 1.34,
-            'AED': 3.67,
-            'CHF': 0.88,
-            'HKD': 7.82,
-            'KRW': 1330.0,
-            'MXN': 17.25,
-            'BRL': 4.95,
-            'RUB': 92.50,
-            'ZAR': 18.75,
-            'TRY': 30.85,
-            'NZD': 1.63,
-            'SEK': 10.45,
-            'NOK': 10.85,
-            'DKK': 6.88,
-            'PLN': 4.02,
-            'THB': 35.60,
-            'IDR': 15650.0,
-            'MYR': 4.68,
-            'PHP': 56.20,
-            'SAR': 3.75,
-            'EGP': 30.90,
-            'PKR': 281.5,
+            'success': True,
+            'amount': amount,
+            'from': from_currency,
+            'to': to_currency,
+            'result': round(result, 4),
+            'rate': round(rate, 6),
+            'timestamp': snapshot.fetched_at.isoformat()
         }
     
+    def send_conversion(self, amount, from_currency, to_currency):
+        """Send a conversion, reusing the encoded response for repeated requests"""
+        snapshot = RATE_STORE.snapshot()
+        encoded = CONVERSION_CACHE.get(
+            snapshot.version, (amount, from_currency, to_currency),
+            lambda: self.convert(amount, from_currency, to_currency, snapshot))
+        self.send_encoded(encoded, 0)
+    
     def handle_conversion(self, parsed_path):
         """Handle currency conversion request"""
         query_params = urllib.parse.parse_qs(parsed_path.query)
@@ -1311,42 +2567,7 @@ class CurrencyConverterHandler(BaseHTTPRequestHandler):
             if amount <= 0:
                 raise ValueError("Amount must be positive")
             
-            rates = self.get_exchange_rates()
-            
-            # Convert to USD first, then to target currency
-            if from_currency == 'USD':
-                from_rate = 1.0
-            else:
-                from_rate = rates.get(from_currency)
-                if not from_rate:
-                    raise ValueError(f"Unsupported currency: {from_currency}")
-            
-            if to_currency == 'USD':
-                to_rate = 1.0
-            else:
-                to_rate = rates.get(to_currency)
-                if not to_rate:
-                    raise ValueError(f"Unsupported currency: {to_currency}")
-            
-            # Convert amount to USD, then to target currency
-            amount_in_usd = amount / from_rate
-            result = amount_in_usd * to_rate
-            rate = to_rate / from_rate
-            
-            response = {
-                'success': True,
-                'amount': amount,
-                'from': from_currency,
-                'to': to_currency,
-                'result': round(result, 4),
-                'rate': round(rate, 6),
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
+            self.send_conversion(amount, from_currency, to_currency)
             
         except Exception as e:
             self.send_response(400)
@@ -1371,35 +2592,65 @@ class CurrencyConverterHandler(BaseHTTPRequestHandler):
             if amount <= 0:
                 raise ValueError("Amount must be positive")
             
-            rates = self.get_exchange_rates()
+            self.send_conversion(amount, from_currency, to_currency)
             
-            # Convert to USD first, then to target currency
-            if from_currency == 'USD':
-                from_rate = 1.0
-            else:
-                from_rate = rates.get(from_currency)
-                if not from_rate:
-                    raise ValueError(f"Unsupported currency: {from_currency}")
+        except Exception as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode())
+    
+    def handle_batch_conversion(self):
+        """Convert columns of amounts against one rate snapshot.
+        
+        ``from``/``to`` are one code or an array per row; with ``"minor_units": true``
+        amounts and results are integer minor units.
+        """
+        try:
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length).decode('utf-8')
+            data = json.loads(post_data)
             
-            if to_currency == 'USD':
-                to_rate = 1.0
+            amounts = data.get('amounts')
+            if not isinstance(amounts, list):
+                raise ValueError("'amounts' must be an array")
+            minor_units = bool(data.get('minor_units'))
+            if minor_units:
+                if not all(isinstance(amount, int) and not isinstance(amount, bool) for amount in amounts):
+                    raise ValueError("'amounts' must be integers when minor_units is set")
             else:
-                to_rate = rates.get(to_currency)
-                if not to_rate:
-                    raise ValueError(f"Unsupported currency: {to_currency}")
+                amounts = [float(amount) for amount in amounts]
+            count = len(amounts)
+            
+            columns = []
+            for key, default in (('from', 'USD'), ('to', 'EUR')):
+                codes = data.get(key, default)
+                if isinstance(codes, str):
+                    codes = [codes.upper()] * count
+                elif isinstance(codes, list) and len(codes) == count:
+                    codes = [str(code).upper() for code in codes]
+                else:
+                    raise ValueError(f"'{key}' must be a currency code or an array of {count} codes")
+                columns.append(codes)
+            from_codes, to_codes = columns
             
-            # Convert amount to USD, then to target currency
-            amount_in_usd = amount / from_rate
-            result = amount_in_usd * to_rate
-            rate = to_rate / from_rate
+            snapshot = RATE_STORE.snapshot()
+            rates = snapshot.matrix.rates_for(from_codes, to_codes)
+            if minor_units:
+                results = snapshot.fixed.convert_many(amounts, from_codes, to_codes)
+            else:
+                results = [round(amount * rate, 4) for amount, rate in zip(amounts, rates)]
             
             response = {
                 'success': True,
-                'amount': amount,
-                'from': from_currency,
-                'to': to_currency,
-                'result': round(result, 4),
-                'rate': round(rate, 6),
+                'count': count,
+                'version': snapshot.version,
+                'minor_units': minor_units,
+                'results': results,
+                'rates': [round(rate, 6) for rate in rates],
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -1417,61 +2668,401 @@ class CurrencyConverterHandler(BaseHTTPRequestHandler):
                 'error': str(e)
             }).encode())
     
+    def handle_csv_conversion(self, parsed_path):
+        """Stream a converted copy of an uploaded CSV back to the client.
+        
+        Columns default to amount/from/to (see ``amount_column`` and friends),
+        or pass a fixed ``from``/``to`` pair.
+        """
+        query_params = urllib.parse.parse_qs(parsed_path.query)
+        option = lambda name, default=None: query_params.get(name, [default])[0]
+        
+        try:
+            chunked = 'chunked' in self.headers.get('Transfer-Encoding', '').lower()
+            content_length = None if chunked else int(self.headers.get('Content-Length', 0))
+            body = RequestBodyReader(self.rfile, content_length, chunked)
+            # Undecodable bytes become U+FFFD and fail that row, not the stream
+            text = io.TextIOWrapper(io.BufferedReader(body), encoding='utf-8',
+                                    errors='replace', newline='')
+            
+            from_currency = option('from')
+            to_currency = option('to')
+            snapshot = RATE_STORE.snapshot()
+            rows = convert_csv_rows(
+                csv.reader(text), snapshot.matrix,
+                amount_column=option('amount_column', 'amount'),
+                from_column=option('from_column', 'from'),
+                to_column=option('to_column', 'to'),
+                from_currency=from_currency.upper() if from_currency else None,
+                to_currency=to_currency.upper() if to_currency else None,
+            )
+            chunks = encode_csv_chunks(rows)
+            # Pull the header through first so bad column names still get a 400
+            first_chunk = next(chunks, b'')
+        except Exception as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode())
+            return
+        
+        started = time.monotonic()
+        total_bytes = 0
+        self.begin_chunked('text/csv; charset=utf-8', {
+            'X-Rate-Version': snapshot.version,
+        }, trailers=('X-Bytes', 'X-Elapsed-Seconds', 'X-Bytes-Per-Second', 'X-Error'))
+        trailers = {}
+        try:
+            for chunk in itertools.chain([first_chunk], chunks):
+                total_bytes += len(chunk)
+                self.write_chunk(chunk)
+        except Exception as e:
+            # Too late for an error status; end the stream cleanly and say why it stopped
+            print(f"⚠️  CSV conversion stream stopped: {e}")
+            trailers['X-Error'] = ' '.join(str(e).split()).encode('ascii', 'replace').decode()
+        elapsed = time.monotonic() - started
+        self.end_chunked({
+            'X-Bytes': total_bytes,
+            'X-Elapsed-Seconds': round(elapsed, 3),
+            'X-Bytes-Per-Second': int(total_bytes / elapsed) if elapsed else total_bytes,
+            **trailers,
+        })
+    
+    def begin_chunked(self, content_type, headers=None, trailers=()):
+        """Start a streamed response, using chunked encoding when the client allows"""
+        self.use_chunked = self.request_version == 'HTTP/1.1'
+        if self.use_chunked:
+            # Chunked encoding needs an HTTP/1.1 status line for this response only
+            self.protocol_version = 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        if self.use_chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            if trailers:
+                self.send_header('Trailer', ', '.join(trailers))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+    
+    def write_chunk(self, data):
+        if not data:
+            return
+        if self.use_chunked:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        else:
+            self.wfile.write(data)
+    
+    def end_chunked(self, trailers=None):
+        if self.use_chunked:
+            fields = ''.join(f'{name}: {value}\r\n' for name, value in (trailers or {}).items())
+            self.wfile.write(b'0\r\n' + fields.encode('latin-1') + b'\r\n')
+    
+    def serve_rate_history(self, parsed_path):
+        """Return a pair's rate history between two times, downsampled to step"""
+        query_params = urllib.parse.parse_qs(parsed_path.query)
+        option = lambda name: query_params.get(name, [None])[0]
+        
+        try:
+            pair = (option('pair') or '').upper().split('/')
+            if len(pair) != 2 or not all(pair):
+                raise ValueError("pair must look like USD/NPR")
+            start = parse_time_param(option('from')) if option('from') else None
+            end = parse_time_param(option('to')) if option('to') else None
+            step = parse_step_param(option('step')) if option('step') else None
+            
+            timestamps, rates = RATE_HISTORY.query(pair[0], pair[1], start, end, step)
+            response = {
+                'success': True,
+                'pair': '/'.join(pair),
+                'count': len(timestamps),
+                'timestamps': timestamps,
+                'rates': rates,
+            }
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+            
+        except Exception as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode())
+    
     def serve_popular_rates(self):
         """Return popular exchange rates vs USD"""
-        rates = self.get_exchange_rates()
-        popular_rates = {}
+        snapshot = RATE_STORE.snapshot()
         
-        for currency in self.POPULAR_CURRENCIES.keys():
-            if currency in rates and currency != 'USD':
-                popular_rates[currency] = rates[currency]
+        def popular_rates():
+            return {currency: snapshot.rates[currency]
+                    for currency in CURRENCIES.popular()
+                    if currency in snapshot.rates and currency != 'USD'}
+        
+        encoded = RESPONSE_CACHE.get(snapshot.version, 'popular', popular_rates)
+        self.send_encoded(encoded, RATES_MAX_AGE)
+    
+    def serve_rate_stream(self, parsed_path):
+        """Open a Server-Sent Events stream of rate updates"""
+        query_params = urllib.parse.parse_qs(parsed_path.query)
+        last_event_id = self.headers.get('Last-Event-ID') or query_params.get('lastEventId', [None])[0]
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
         
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(json.dumps(popular_rates).encode())
+        self.wfile.flush()
+        
+        # The broadcaster owns the socket from here on
+        self.server.detach(self.request)
+        RATE_BROADCASTER.subscribe(self.request, last_event_id)
+    
+    def serve_rate_table(self):
+        """Return the whole rate snapshot in compact columns for client-side conversion"""
+        snapshot = RATE_STORE.snapshot()
+        
+        def rate_table():
+            rates = snapshot.matrix.row(RATE_STORE.base)
+            return {
+                'version': snapshot.version,
+                'base': RATE_STORE.base,
+                'codes': list(rates),
+                'rates': list(rates.values()),
+            }
+        
+        encoded = RESPONSE_CACHE.get(snapshot.version, 'table', rate_table)
+        self.send_encoded(encoded, RATES_MAX_AGE)
+    
+    def serve_latest_rates(self, parsed_path):
+        """Return all latest exchange rates, optionally against another base"""
+        query_params = urllib.parse.parse_qs(parsed_path.query)
+        base = query_params.get('base', ['USD'])[0].upper()
+        snapshot = RATE_STORE.snapshot()
+        
+        try:
+            encoded = RESPONSE_CACHE.get(snapshot.version, ('latest', base),
+                                         lambda: snapshot.matrix.row(base))
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode())
+            return
+        
+        self.send_encoded(encoded, RATES_MAX_AGE)
     
-    def serve_latest_rates(self):
-        """Return all latest exchange rates"""
-        rates = self.get_exchange_rates()
+    def send_encoded(self, encoded, max_age, content_type='application/json'):
+        """Send a pre-encoded response, or 304 if the client's copy is current"""
+        use_gzip = negotiate_encoding(self.headers.get('Accept-Encoding', '')) == 'gzip'
+        etag = encoded.gzip_etag if use_gzip else encoded.etag
+        cache_control = f'public, max-age={max_age}'
+        
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
         
+        body = encoded.gzipped if use_gzip else encoded.body
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(json.dumps(rates).encode())
+        self.wfile.write(body)
+    
+    def serve_conversion_history(self, parsed_path):
+        """Return one page of conversion history, newest first.
+        
+        Pass the last id as ``after`` for the next page; filter with ``pair`` and ``since``/``until``.
+        """
+        query_params = urllib.parse.parse_qs(parsed_path.query)
+        
+        try:
+            query = build_history_query(query_params)
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode())
+            return
+        
+        with DB_POOL.connection() as conn:
+            rows = query_history(conn, query)
+            self.begin_chunked('application/json')
+            for chunk in group_chunks(encode_history_rows(rows)):
+                self.write_chunk(chunk)
+            self.end_chunked()
+    
+    def serve_history_export(self, parsed_path):
+        """Stream the matching history as CSV, NDJSON or columnar binary, gzipped if accepted"""
+        query_params = urllib.parse.parse_qs(parsed_path.query)
+        export_format = query_params.get('format', ['csv'])[0]
+        
+        try:
+            if export_format not in ('csv', 'ndjson', 'columnar'):
+                raise ValueError("format must be csv, ndjson or columnar")
+            query = build_history_query(query_params, default_limit=None, max_limit=None)
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode())
+            return
+        
+        if not EXPORT_SLOTS.acquire(blocking=False):
+            self.send_response(503)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Retry-After', '5')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': 'Too many exports in progress'
+            }).encode())
+            return
+        try:
+            self.stream_history_export(query, export_format)
+        finally:
+            EXPORT_SLOTS.release()
+    
+    def stream_history_export(self, query, export_format):
+        use_gzip = negotiate_encoding(self.headers.get('Accept-Encoding', '')) == 'gzip'
+        headers = {
+            'Content-Disposition': f'attachment; filename="conversions.{export_format}"',
+            'Vary': 'Accept-Encoding',
+        }
+        if use_gzip:
+            headers['Content-Encoding'] = 'gzip'
+        
+        started = time.monotonic()
+        exported = 0
+        total_bytes = 0
+        
+        def counted(rows):
+            nonlocal exported
+            for row in rows:
+                exported += 1
+                yield row
+        
+        with DB_POOL.read_only() as conn:
+            rows = counted(query_history(conn, query))
+            if export_format == 'csv':
+                content_type = 'text/csv; charset=utf-8'
+                chunks = encode_csv_chunks(itertools.chain(
+                    [('id', 'date', 'from', 'to', 'amount', 'result', 'rate')], rows))
+            elif export_format == 'ndjson':
+                content_type = 'application/x-ndjson'
+                chunks = group_chunks(encode_history_ndjson(rows))
+            else:
+                content_type = 'application/octet-stream'
+                chunks = group_chunks(ColumnarHistory.encode(rows))
+            
+            self.begin_chunked(content_type, headers,
+                               trailers=('X-Rows', 'X-Bytes', 'X-Elapsed-Seconds'))
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+            for chunk in chunks:
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                total_bytes += len(chunk)
+                self.write_chunk(chunk)
+            if compressor is not None:
+                chunk = compressor.flush()
+                total_bytes += len(chunk)
+                self.write_chunk(chunk)
+        
+        self.end_chunked({
+            'X-Rows': exported,
+            'X-Bytes': total_bytes,
+            'X-Elapsed-Seconds': round(time.monotonic() - started, 3),
+        })
     
-    def serve_conversion_history(self):
-        """Return conversion history"""
-        # For simplicity, return empty array
-        # In production, you'd retrieve from database
+    def serve_analytics(self, parsed_path):
+        """Return top pairs, volume per currency and median amounts from the rollups.
+        
+        Takes ``grain`` (hour or day), ``periods``, ``currency`` and ``limit``.
+        """
+        query_params = urllib.parse.parse_qs(parsed_path.query)
+        option = lambda name: query_params.get(name, [None])[0]
         
-        history = []
+        try:
+            grain = option('grain') or 'hour'
+            if grain not in ANALYTICS_PERIODS:
+                raise ValueError("grain must be hour or day")
+            default_periods, max_periods = ANALYTICS_PERIODS[grain]
+            periods = int(option('periods') or default_periods)
+            if not 1 <= periods <= max_periods:
+                raise ValueError(f"periods must be between 1 and {max_periods}")
+            limit = int(option('limit') or ANALYTICS_TOP_PAIRS)
+            if limit <= 0:
+                raise ValueError("limit must be positive")
+            currency = (option('currency') or '').upper() or None
+        except ValueError as e:
+            self.send_response(400)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': str(e)
+            }).encode())
+            return
+        
+        with DB_POOL.connection() as conn:
+            response = query_analytics(conn, grain, periods, currency,
+                                       min(limit, ANALYTICS_MAX_TOP_PAIRS))
+        response['success'] = True
         
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
         self.end_headers()
-        self.wfile.write(json.dumps(history).encode())
+        self.wfile.write(json.dumps(response).encode())
     
     def save_conversion(self):
-        """Save conversion to history"""
+        """Queue a conversion to be written to history"""
         try:
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length).decode('utf-8')
             data = json.loads(post_data)
             
-            # In production, save to database
-            # For now, just return success
-            
-            response = {
-                'success': True,
-                'message': 'Conversion saved'
-            }
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
+            for field in ('amount', 'from', 'to', 'result', 'rate'):
+                if field not in data:
+                    raise ValueError(f"Missing field: {field}")
             
+            record = (
+                float(data['amount']),
+                str(data['from']).upper(),
+                str(data['to']).upper(),
+                float(data['result']),
+                float(data['rate']),
+                datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            )
         except Exception as e:
             self.send_response(400)
             self.send_header('Content-type', 'application/json')
@@ -1480,6 +3071,69 @@ class CurrencyConverterHandler(BaseHTTPRequestHandler):
                 'success': False,
                 'error': str(e)
             }).encode())
+            return
+        
+        if not HISTORY_WRITER.submit(record):
+            self.send_response(503)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Retry-After', '1')
+            self.end_headers()
+            self.wfile.write(json.dumps({
+                'success': False,
+                'error': 'History is busy, try again shortly'
+            }).encode())
+            return
+        
+        response = {
+            'success': True,
+            'message': 'Conversion saved'
+        }
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+    
+    def rate_limited(self, parsed_path):
+        """Answer 429 and return True when this client is out of tokens, before any body is read"""
+        if not parsed_path.path.startswith('/api/') or parsed_path.path == '/api/stats':
+            return False
+        api_key = self.headers.get('X-API-Key')
+        client = f'key:{api_key}' if api_key in RATE_LIMIT_API_KEYS else self.client_address[0]
+        wait = RATE_LIMITER.acquire(client)
+        if not wait:
+            return False
+        
+        self.send_response(429)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Retry-After', str(math.ceil(wait)))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(json.dumps({
+            'success': False,
+            'error': 'Too many requests'
+        }).encode())
+        self.close_connection = True
+        return True
+    
+    def serve_stats(self):
+        """Return internal counters for the rate store"""
+        stats = {
+            'rates': RATE_STORE.stats(),
+            'upstream': RATE_FETCHER.stats(),
+            'history': HISTORY_WRITER.stats(),
+            'db_pool': DB_POOL.stats(),
+            'db_maintenance': DB_MAINTENANCE.stats(),
+            'responses': RESPONSE_CACHE.stats(),
+            'conversions': CONVERSION_CACHE.stats(),
+            'stream': RATE_BROADCASTER.stats(),
+            'rate_limit': RATE_LIMITER.stats(),
+        }
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(stats).encode())
     
     def send_favicon(self):
         self.send_response(200)
@@ -1487,26 +3141,145 @@ class CurrencyConverterHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(b'')
 
+class CurrencyHTTPServer(ThreadingHTTPServer):
+    """Threaded server that lets handlers hand their connection to another owner"""
+    
+    request_queue_size = 128
+    
+    def __init__(self, *args, **kwargs):
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+    
+    def detach(self, request):
+        """Keep the server from closing this connection when its handler returns"""
+        with self._detached_lock:
+            self._detached.add(request)
+    
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+SERVER_WORKERS = int(os.environ.get('CURRENCY_WORKERS', 1))  # Processes serving the one port
+
+def run_worker(server, table):
+    """Serve requests in a forked worker that follows the shared rate table"""
+    RATE_HISTORY.persist = False
+    RATE_STORE.follow(table)
+    RATE_BROADCASTER.start()
+    HISTORY_WRITER.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        HISTORY_WRITER.close()
+        DB_POOL.close()
+
+def serve_with_workers(server, count):
+    """Fork workers onto the listening socket while this process alone refreshes rates"""
+    table = SharedRateTable.create()
+    table.publish(RATE_STORE.snapshot())
+    RATE_STORE.add_listener(table.publish, owner_only=True)
+    
+    # Each worker accepts for itself; the losers of a wake-up just go back to waiting
+    server.socket.setblocking(False)
+    DB_POOL.close()  # SQLite connections must not cross a fork
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=run_worker, args=(server, table), name=f'currency-worker-{i}')
+               for i in range(count)]
+    for worker in workers:
+        worker.start()
+    
+    try:
+        RATE_STORE.start()
+        DB_MAINTENANCE.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+        table.close(unlink=True)
+
 def init_database():
     """Initialize SQLite database for history"""
     try:
-        conn = sqlite3.connect('currency_converter.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                amount REAL NOT NULL,
-                from_currency TEXT NOT NULL,
-                to_currency TEXT NOT NULL,
-                result REAL NOT NULL,
-                rate REAL NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with DB_POOL.connection() as conn:
+            cursor = conn.cursor()
+            
+            if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                # Incremental auto-vacuum lets maintenance return dropped partitions
+                # in small steps; switching an existing file needs one full VACUUM
+                cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                cursor.execute('VACUUM')
+            
+            create_partition(conn, partition_key(datetime.now(timezone.utc).strftime('%Y-%m-%d')))
+            if cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversions'"
+            ).fetchone():
+                # Move history from the single pre-partitioning table into monthly ones
+                months = cursor.execute(
+                    'SELECT DISTINCT substr(timestamp, 1, 7) FROM conversions'
+                ).fetchall()
+                for month, in months:
+                    key = partition_key(month)
+                    create_partition(conn, key)
+                    cursor.execute(f'''
+                        INSERT INTO {partition_table(key)}
+                            (amount, from_currency, to_currency, result, rate, timestamp)
+                        SELECT amount, from_currency, to_currency, result, rate, timestamp
+                        FROM conversions WHERE substr(timestamp, 1, 7) = ? ORDER BY id
+                    ''', (month,))
+                cursor.execute('DROP TABLE conversions')
+            
+            rollups_exist = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversion_rollups'"
+            ).fetchone()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS conversion_rollups (
+                    grain TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    from_currency TEXT NOT NULL,
+                    to_currency TEXT NOT NULL,
+                    conversions INTEGER NOT NULL,
+                    amount_total REAL NOT NULL,
+                    result_total REAL NOT NULL,
+                    PRIMARY KEY (grain, bucket, from_currency, to_currency)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS amount_histogram (
+                    grain TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    currency TEXT NOT NULL,
+                    bin INTEGER NOT NULL,
+                    conversions INTEGER NOT NULL,
+                    PRIMARY KEY (grain, bucket, currency, bin)
+                ) WITHOUT ROWID
+            ''')
+            if not rollups_exist:
+                # One-off backfill from history written before the rollups existed
+                for key in conversion_partitions(conn):
+                    rows = conn.execute(
+                        'SELECT amount, from_currency, to_currency, result, rate, timestamp '
+                        f'FROM {partition_table(key)}'
+                    )
+                    for batch in iter(lambda: rows.fetchmany(HISTORY_BATCH_SIZE), []):
+                        HistoryWriter.write_rollups(conn, batch)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rate_snapshots (
+                    version INTEGER PRIMARY KEY,
+                    fetched_at DATETIME NOT NULL,
+                    data BLOB NOT NULL
+                )
+            ''')
+            
+            conn.commit()
         print("✅ Database initialized successfully")
     except Exception as e:
         print(f"⚠️  Database initialization failed: {e}")
@@ -1515,17 +3288,22 @@ if __name__ == '__main__':
     # Initialize database
     init_database()
     
+    # Warm start from the last saved rates, then keep them fresh in the background
+    RATE_STORE.restore(SNAPSHOT_ARCHIVE.load())
+    RATE_HISTORY.load()
+    
     PORT = 8080
     HOST = '0.0.0.0'
     
     try:
-        server = HTTPServer((HOST, PORT), CurrencyConverterHandler)
+        server = CurrencyHTTPServer((HOST, PORT), CurrencyConverterHandler)
         
         print("=" * 60)
         print("💱 CURRENCY CONVERTER PRO (WITH NPR)")
         print("=" * 60)
         print(f"🌐 Server URL: http://{HOST}:{PORT}")
-        print(f"💾 Database: currency_converter.db")
+        print(f"💾 Database: {DATABASE_PATH}")
+        print(f"🧵 Worker processes: {SERVER_WORKERS}")
         print("\n✨ Features:")
         print("   • 💰 Convert 31+ currencies including NPR")
         print("   • 🇳🇵 Nepali Rupee (NPR) support")
@@ -1545,9 +3323,18 @@ if __name__ == '__main__':
         print("\n🛑 Press Ctrl+C to stop")
         print("=" * 60)
         
-        server.serve_forever()
+        if SERVER_WORKERS > 1:
+            serve_with_workers(server, SERVER_WORKERS)
+        else:
+            DB_MAINTENANCE.start()
+            RATE_STORE.start()
+            RATE_BROADCASTER.start()
+            HISTORY_WRITER.start()
+            server.serve_forever()
         
     except KeyboardInterrupt:
+        HISTORY_WRITER.close()
+        DB_POOL.close()
         print("\n\n👋 Server stopped by user")
     except Exception as e:
         print(f"❌ Error: {e}")
\ No newline at end of file
@@ -0,0 +1,512 @@
+// Global variables
+let currencies = [];
+let exchangeRates = {};
+let rateVersion = null;
+
+// How often to check for a new rate table (the browser revalidates with its ETag)
+const RATE_TABLE_CHECK_MS = 60 * 1000;
+
+// DOM Elements
+const fromCurrencySelect = document.getElementById('fromCurrency');
+const toCurrencySelect = document.getElementById('toCurrency');
+const amountInput = document.getElementById('amount');
+const fromCurrencySymbol = document.getElementById('fromCurrencySymbol');
+const resultCard = document.getElementById('resultCard');
+const resultAmount = document.getElementById('resultAmount');
+const resultCurrency = document.getElementById('resultCurrency');
+const exchangeRate = document.getElementById('exchangeRate');
+const lastUpdatedTime = document.getElementById('lastUpdatedTime');
+const popularRates = document.getElementById('popularRates');
+const historyTable = document.getElementById('historyTable');
+const lastUpdatedSpan = document.getElementById('last-updated');
+const convertBtn = document.getElementById('convertBtn');
+
+// Initialize on page load
+document.addEventListener('DOMContentLoaded', function() {
+    loadCurrencies();
+    loadRateTable();
+    if (window.EventSource) {
+        subscribeToRates();
+    } else {
+        setInterval(loadRateTable, RATE_TABLE_CHECK_MS);
+    }
+    loadPopularRates();
+    loadHistory();
+    updateLastUpdated();
+});
+
+// Load all available currencies
+function loadCurrencies() {
+    fetch('/api/currencies')
+        .then(response => response.json())
+        .then(data => {
+            currencies = data;
+            populateCurrencySelects();
+            // Set default currencies
+            setDefaultCurrencies();
+        })
+        .catch(error => {
+            console.error('Error loading currencies:', error);
+            showToast('Error loading currencies', 'error');
+        });
+}
+
+// Load the rate table used for converting in the browser
+function loadRateTable() {
+    return fetch('/api/rates/table')
+        .then(response => response.json())
+        .then(table => {
+            if (table.version === rateVersion) {
+                return;
+            }
+            const rates = {};
+            table.codes.forEach((code, i) => {
+                rates[code] = table.rates[i];
+            });
+            exchangeRates = rates;
+            if (rateVersion !== null) {
+                loadPopularRates();
+            }
+            rateVersion = table.version;
+        })
+        .catch(error => {
+            console.error('Error loading rate table:', error);
+        });
+}
+
+// Keep the rate table current from the server's event stream
+function subscribeToRates() {
+    const stream = new EventSource('/api/rates/stream');
+
+    stream.addEventListener('snapshot', event => {
+        const data = JSON.parse(event.data);
+        exchangeRates = data.rates;
+        rateVersion = data.version;
+    });
+
+    stream.addEventListener('rates', event => {
+        const data = JSON.parse(event.data);
+        Object.assign(exchangeRates, data.changed);
+        data.removed.forEach(code => delete exchangeRates[code]);
+        rateVersion = data.version;
+        loadPopularRates();
+    });
+}
+
+// Convert locally from the rate table, or return null if a rate is missing
+function convertLocally(amount, fromCurrency, toCurrency) {
+    const fromRate = exchangeRates[fromCurrency];
+    const toRate = exchangeRates[toCurrency];
+    if (!fromRate || !toRate) {
+        return null;
+    }
+    const rate = toRate / fromRate;
+    return {
+        success: true,
+        amount: amount,
+        from: fromCurrency,
+        to: toCurrency,
+        result: Math.round(amount * rate * 1e4) / 1e4,
+        rate: Math.round(rate * 1e6) / 1e6,
+        version: rateVersion,
+        timestamp: new Date().toISOString()
+    };
+}
+
+// Populate currency dropdowns
+function populateCurrencySelects() {
+    fromCurrencySelect.innerHTML = '';
+    toCurrencySelect.innerHTML = '';
+
+    currencies.forEach(currency => {
+        const option1 = document.createElement('option');
+        option1.value = currency.code;
+        option1.textContent = `${currency.code} - ${currency.name}`;
+
+        const option2 = option1.cloneNode(true);
+
+        fromCurrencySelect.appendChild(option1);
+        toCurrencySelect.appendChild(option2);
+    });
+}
+
+// Set default currencies
+function setDefaultCurrencies() {
+    // Try to get user's location for default currency
+    const userCurrency = getUserCurrency();
+
+    fromCurrencySelect.value = userCurrency;
+    toCurrencySelect.value = 'EUR';
+    updateCurrencySymbol();
+}
+
+// Guess user's currency based on browser language
+function getUserCurrency() {
+    const language = navigator.language || 'en-US';
+
+    if (language.includes('en-US') || language.includes('en-CA')) return 'USD';
+    if (language.includes('en-GB')) return 'GBP';
+    if (language.includes('en-AU')) return 'AUD';
+    if (language.includes('ja')) return 'JPY';
+    if (language.includes('zh')) return 'CNY';
+    if (language.includes('hi')) return 'INR';
+    if (language.includes('ne')) return 'NPR';  // Nepali language
+    if (language.includes('ar')) return 'AED';
+
+    // Default to USD
+    return 'USD';
+}
+
+// Load popular exchange rates
+function loadPopularRates() {
+    fetch('/api/popular')
+        .then(response => response.json())
+        .then(data => {
+            displayPopularRates(data);
+        })
+        .catch(error => {
+            console.error('Error loading popular rates:', error);
+        });
+}
+
+// Display popular rates in sidebar
+function displayPopularRates(rates) {
+    popularRates.innerHTML = '';
+
+    Object.entries(rates).forEach(([currency, rate]) => {
+        const rateItem = document.createElement('div');
+        rateItem.className = 'rate-item';
+        rateItem.onclick = () => {
+            toCurrencySelect.value = currency;
+            convertCurrency();
+        };
+
+        const currencyInfo = getCurrencyInfo(currency);
+
+        rateItem.innerHTML = `
+            <div class="rate-currency">
+                <span class="rate-symbol">${currencyInfo.symbol}</span>
+                <span class="rate-code">${currency}</span>
+            </div>
+            <div class="rate-value">${rate.toFixed(4)}</div>
+        `;
+
+        popularRates.appendChild(rateItem);
+    });
+}
+
+// Get currency info (symbol, name)
+function getCurrencyInfo(currencyCode) {
+    const currency = currencies.find(c => c.code === currencyCode);
+    if (currency) {
+        return {
+            symbol: currency.symbol || currencyCode,
+            name: currency.name
+        };
+    }
+    return { symbol: currencyCode, name: currencyCode };
+}
+
+// Main conversion function
+function convertCurrency() {
+    const amount = parseFloat(amountInput.value);
+    const fromCurrency = fromCurrencySelect.value;
+    const toCurrency = toCurrencySelect.value;
+
+    if (!amount || amount <= 0) {
+        showToast('Please enter a valid amount', 'error');
+        return;
+    }
+
+    if (fromCurrency === toCurrency) {
+        showToast('Please select different currencies', 'error');
+        return;
+    }
+
+    // Use the local rate table when it has both currencies
+    const local = convertLocally(amount, fromCurrency, toCurrency);
+    if (local) {
+        displayResult(local);
+        saveConversionToLocal(local);
+        updateLastUpdated();
+        return;
+    }
+
+    // Show loading
+    convertBtn.innerHTML = '<span class="spinner"></span> Converting...';
+    convertBtn.disabled = true;
+
+    // Make API call
+    fetch(`/api/convert?amount=${amount}&from=${fromCurrency}&to=${toCurrency}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                displayResult(data);
+                saveConversionToLocal(data);
+                updateLastUpdated();
+            } else {
+                showToast(data.error || 'Conversion failed', 'error');
+            }
+        })
+        .catch(error => {
+            console.error('Error converting currency:', error);
+            showToast('Error converting currency', 'error');
+        })
+        .finally(() => {
+            // Reset button
+            convertBtn.innerHTML = '<i class="fas fa-calculator"></i> Convert';
+            convertBtn.disabled = false;
+        });
+}
+
+// Convert USD to Nepali Rupee
+function convertToNPR(amount) {
+    amountInput.value = amount;
+    fromCurrencySelect.value = 'USD';
+    toCurrencySelect.value = 'NPR';
+    updateCurrencySymbol();
+    convertCurrency();
+}
+
+// Convert Nepali Rupee to USD
+function convertFromNPR(amount) {
+    amountInput.value = amount;
+    fromCurrencySelect.value = 'NPR';
+    toCurrencySelect.value = 'USD';
+    updateCurrencySymbol();
+    convertCurrency();
+}
+
+// Display conversion result
+function displayResult(data) {
+    resultAmount.textContent = data.result.toLocaleString('en-US', {
+        minimumFractionDigits: 2,
+        maximumFractionDigits: 2
+    });
+
+    resultCurrency.textContent = data.to;
+    exchangeRate.textContent = data.rate.toFixed(6);
+    lastUpdatedTime.textContent = 'Just now';
+
+    // Show result card
+    resultCard.style.display = 'block';
+
+    // Smooth scroll to result
+    resultCard.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+}
+
+// Swap currencies
+function swapCurrencies() {
+    const temp = fromCurrencySelect.value;
+    fromCurrencySelect.value = toCurrencySelect.value;
+    toCurrencySelect.value = temp;
+    updateCurrencySymbol();
+
+    // Convert immediately if there's a result
+    if (resultCard.style.display !== 'none') {
+        convertCurrency();
+    }
+}
+
+// Update currency symbol display
+function updateCurrencySymbol() {
+    const currencyCode = fromCurrencySelect.value;
+    const currencyInfo = getCurrencyInfo(currencyCode);
+    fromCurrencySymbol.textContent = currencyInfo.symbol;
+}
+
+// Set amount quickly
+function setAmount(amount) {
+    amountInput.value = amount;
+    convertCurrency();
+}
+
+// Clear form
+function clearForm() {
+    amountInput.value = '';
+    resultCard.style.display = 'none';
+    showToast('Form cleared', 'info');
+}
+
+// Save conversion to server
+function saveConversion() {
+    const amount = parseFloat(amountInput.value);
+    const fromCurrency = fromCurrencySelect.value;
+    const toCurrency = toCurrencySelect.value;
+
+    fetch('/api/save', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            amount: amount,
+            from: fromCurrency,
+            to: toCurrency,
+            result: parseFloat(resultAmount.textContent.replace(/,/g, '')),
+            rate: parseFloat(exchangeRate.textContent)
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            showToast('Conversion saved!', 'success');
+            loadHistory();
+        }
+    })
+    .catch(error => {
+        console.error('Error saving conversion:', error);
+    });
+}
+
+// Save conversion to localStorage
+function saveConversionToLocal(data) {
+    const history = JSON.parse(localStorage.getItem('currencyHistory') || '[]');
+
+    history.unshift({
+        date: new Date().toLocaleString(),
+        from: data.from,
+        to: data.to,
+        amount: data.amount,
+        result: data.result,
+        rate: data.rate
+    });
+
+    // Keep only last 50 conversions
+    if (history.length > 50) {
+        history.pop();
+    }
+
+    localStorage.setItem('currencyHistory', JSON.stringify(history));
+    loadHistory();
+}
+
+// Load conversion history
+function loadHistory() {
+    // Try server history first, fallback to localStorage
+    fetch('/api/history')
+        .then(response => response.json())
+        .then(data => {
+            displayHistory(data);
+        })
+        .catch(() => {
+            // Fallback to localStorage
+            const history = JSON.parse(localStorage.getItem('currencyHistory') || '[]');
+            displayHistory(history);
+        });
+}
+
+// Display history in table
+function displayHistory(history) {
+    historyTable.innerHTML = '';
+
+    if (history.length === 0) {
+        historyTable.innerHTML = `
+            <tr>
+                <td colspan="6" style="text-align: center; padding: 40px; color: var(--gray);">
+                    <i class="fas fa-history" style="font-size: 2rem; margin-bottom: 10px; display: block;"></i>
+                    No conversion history yet
+                </td>
+            </tr>
+        `;
+        return;
+    }
+
+    history.forEach(item => {
+        const row = document.createElement('tr');
+
+        row.innerHTML = `
+            <td>${item.date}</td>
+            <td><strong>${item.from}</strong></td>
+            <td><strong>${item.to}</strong></td>
+            <td>${parseFloat(item.amount).toLocaleString('en-US', {
+                minimumFractionDigits: 2,
+                maximumFractionDigits: 2
+            })}</td>
+            <td><strong>${parseFloat(item.result).toLocaleString('en-US', {
+                minimumFractionDigits: 2,
+                maximumFractionDigits: 2
+            })}</strong></td>
+            <td>${parseFloat(item.rate).toFixed(6)}</td>
+        `;
+
+        historyTable.appendChild(row);
+    });
+}
+
+// Clear history
+function clearHistory() {
+    if (confirm('Are you sure you want to clear all history?')) {
+        localStorage.removeItem('currencyHistory');
+        loadHistory();
+        showToast('History cleared', 'success');
+    }
+}
+
+// Copy result to clipboard
+function copyResult() {
+    const text = `${amountInput.value} ${fromCurrencySelect.value} = ${resultAmount.textContent} ${toCurrencySelect.value}`;
+
+    navigator.clipboard.writeText(text)
+        .then(() => {
+            showToast('Copied to clipboard!', 'success');
+        })
+        .catch(err => {
+            console.error('Failed to copy: ', err);
+            showToast('Failed to copy', 'error');
+        });
+}
+
+// Update last updated time
+function updateLastUpdated() {
+    const now = new Date();
+    lastUpdatedSpan.textContent = `Last updated: ${now.toLocaleTimeString([], {hour: '2-digit', minute:'2-digit'})}`;
+}
+
+// Show toast notification
+function showToast(message, type) {
+    // Remove existing toasts
+    const existingToasts = document.querySelectorAll('.toast');
+    existingToasts.forEach(toast => toast.remove());
+
+    const toast = document.createElement('div');
+    toast.className = `toast ${type}`;
+    toast.textContent = message;
+
+    document.body.appendChild(toast);
+
+    // Auto remove after 3 seconds
+    setTimeout(() => {
+        toast.style.animation = 'slideOut 0.3s ease';
+        setTimeout(() => toast.remove(), 300);
+    }, 3000);
+}
+
+// Event listeners
+fromCurrencySelect.addEventListener('change', updateCurrencySymbol);
+amountInput.addEventListener('input', updateCurrencySymbol);
+
+// Auto-convert when currencies change
+fromCurrencySelect.addEventListener('change', () => {
+    if (amountInput.value && resultCard.style.display !== 'none') {
+        convertCurrency();
+    }
+});
+
+toCurrencySelect.addEventListener('change', () => {
+    if (amountInput.value && resultCard.style.display !== 'none') {
+        convertCurrency();
+    }
+});
+
+// Auto-convert on amount change (with debounce)
+let convertTimeout;
+amountInput.addEventListener('input', () => {
+    clearTimeout(convertTimeout);
+
+    if (amountInput.value && resultCard.style.display !== 'none') {
+        convertTimeout = setTimeout(() => {
+            convertCurrency();
+        }, 500);
+    }
+});
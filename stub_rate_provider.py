@@ -0,0 +1,179 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from email.utils import formatdate, parsedate_to_datetime
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+# Local stand-in for exchangerate-api.com, for trying the currency server
+# without network access. Point the server at it with:
+#   EXCHANGE_RATE_API_URL=http://localhost:9090/v4/latest/{base} python currency_converter.py
+
+# Fault injection for trying timeouts, hedging and the circuit breaker:
+#   STUB_LATENCY=0.5 or STUB_LATENCY=0.1-3   seconds added to every response
+#   STUB_FAILURE_RATE=0.3                     share of requests answered with 503
+#   STUB_CONDITIONAL=0                        ignore If-None-Match/If-Modified-Since
+# All three can be changed while running with GET /control?latency=...&failure_rate=...&conditional=...
+
+UPDATE_INTERVAL = int(os.environ.get('STUB_UPDATE_INTERVAL', 60))  # Seconds between new rates
+
+BASE_RATES = {
+    'USD': 1.0, 'EUR': 0.92, 'GBP': 0.79, 'JPY': 148.50, 'CAD': 1.35, 'AUD': 1.52,
+    'CNY': 7.18, 'INR': 83.10, 'NPR': 133.25, 'SGD': 1.34, 'AED': 3.67, 'CHF': 0.88,
+    'HKD': 7.82, 'KRW': 1330.0, 'MXN': 17.25, 'BRL': 4.95, 'RUB': 92.50, 'ZAR': 18.75,
+    'TRY': 30.85, 'NZD': 1.63, 'SEK': 10.45, 'NOK': 10.85, 'DKK': 6.88, 'PLN': 4.02,
+    'THB': 35.60, 'IDR': 15650.0, 'MYR': 4.68, 'PHP': 56.20, 'SAR': 3.75, 'EGP': 30.90,
+    'PKR': 281.5,
+}
+
+class StubRates:
+    """USD rates that drift a little every UPDATE_INTERVAL seconds"""
+
+    def __init__(self, interval=UPDATE_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.rates = dict(BASE_RATES)
+        self.updated = int(time.time())
+        self.requests = 0
+        self.not_modified = 0
+        self.failures = 0
+        self.set_faults(os.environ.get('STUB_LATENCY', '0'), os.environ.get('STUB_FAILURE_RATE', '0'),
+                        os.environ.get('STUB_CONDITIONAL', '1'))
+
+    def set_faults(self, latency=None, failure_rate=None, conditional=None):
+        if latency is not None:
+            low, _, high = latency.partition('-')
+            self.latency = (float(low), float(high or low))
+        if failure_rate is not None:
+            self.failure_rate = float(failure_rate)
+        if conditional is not None:
+            self.conditional = conditional not in ('0', 'false', 'no')
+
+    def inject_faults(self):
+        """Sleep for the configured latency, then return True if this request should fail"""
+        time.sleep(random.uniform(*self.latency))
+        return random.random() < self.failure_rate
+
+    def current(self):
+        with self.lock:
+            now = int(time.time())
+            if now - self.updated >= self.interval:
+                self.rates = {code: rate if code == 'USD' else round(rate * random.uniform(0.99, 1.01), 6)
+                              for code, rate in self.rates.items()}
+                self.updated = now - (now - self.updated) % self.interval
+            return self.rates, self.updated
+
+STUB_RATES = StubRates()
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+
+    @property
+    def stub(self):
+        return self.server.rates
+
+    def do_GET(self):
+        if self.path.startswith('/control'):
+            self.control()
+            return
+
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 3 or parts[:2] != ['v4', 'latest']:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        base = parts[2].upper()
+        usd_rates, updated = self.stub.current()
+        if base not in usd_rates:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.stub.requests += 1
+        if self.stub.inject_faults():
+            self.stub.failures += 1
+            self.send_response(503)
+            self.send_header('Retry-After', '1')
+            self.end_headers()
+            return
+
+        base_rate = usd_rates[base]
+        body = json.dumps({
+            'base': base,
+            'time_last_updated': updated,
+            'time_next_update_unix': updated + self.stub.interval,
+            'rates': {code: rate / base_rate for code, rate in usd_rates.items()},
+        }).encode()
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+        last_modified = formatdate(updated, usegmt=True)
+
+        if self.not_modified_since(etag, updated):
+            self.stub.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def control(self):
+        """Change fault injection settings and report counters"""
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        self.stub.set_faults(query.get('latency', [None])[0], query.get('failure_rate', [None])[0],
+                             query.get('conditional', [None])[0])
+        body = json.dumps({
+            'latency': self.stub.latency,
+            'failure_rate': self.stub.failure_rate,
+            'conditional': self.stub.conditional,
+            'requests': self.stub.requests,
+            'not_modified': self.stub.not_modified,
+            'failures': self.stub.failures,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_modified_since(self, etag, updated):
+        if not self.stub.conditional:
+            return False
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(',')]
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= updated
+            except (TypeError, ValueError):
+                return False
+        return False
+
+class StubProviderServer(ThreadingHTTPServer):
+    # Room for bursts of concurrent fetches without the kernel dropping connects
+    request_queue_size = 128
+
+    def __init__(self, address, handler=StubProviderHandler, rates=None):
+        # Each server can have its own StubRates, so several stubs can misbehave differently
+        self.rates = rates if rates is not None else STUB_RATES
+        super().__init__(address, handler)
+
+if __name__ == '__main__':
+    PORT = int(os.environ.get('STUB_PORT', 9090))
+    server = StubProviderServer(('127.0.0.1', PORT), StubProviderHandler)
+    print(f"🧪 Stub rate provider on http://127.0.0.1:{PORT}/v4/latest/USD")
+    print(f"   New rates every {UPDATE_INTERVAL}s, latency {STUB_RATES.latency}s, "
+          f"failure rate {STUB_RATES.failure_rate}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stub provider stopped")